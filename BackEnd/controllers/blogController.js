@@ -22,18 +22,31 @@ export const bulkCreateBlogs = async (req, res) => {
       return res.status(200).json({ ok: true, inserted: 0, upserted: 0 })
     }
 
+    // items carry their content hash as idempotency_key (Scrapper/bulk_poster.py);
+    // one whose stored key matches was already applied, e.g. a retried 413 half
+    const refs = items.filter((it) => it?.reference_id && it.idempotency_key).map((it) => it.reference_id)
+    const stored = refs.length
+      ? new Map((await Blog.find({ reference_id: { $in: refs } }, { reference_id: 1, idempotency_key: 1 }).lean())
+          .map((d) => [d.reference_id, d.idempotency_key]))
+      : new Map()
+    const fresh = items.filter((it) => !(it?.idempotency_key && stored.get(it.reference_id) === it.idempotency_key))
+    if (!fresh.length) {
+      return res.status(200).json({ ok: true, inserted: 0, upserted: 0, replayed: items.length })
+    }
+
     const now = new Date()
-    const ops = items.map((it) => {
+    const ops = fresh.map((it) => {
       if (it && typeof it.reference_id === "string" && it.reference_id.trim() !== "") {
         // Upsert by reference_id (idempotent)
+        const { views, comments, featured, createdAt, updatedAt, ...fields } = it
         return {
           updateOne: {
             filter: { reference_id: it.reference_id },
             update: {
-              // on first insert, write everything + createdAt
-              $setOnInsert: { ...it, createdAt: now },
-              // on every run, at least bump updatedAt; add fields here if you want to keep them in sync
-              $set: { updatedAt: now },
+              // projected fields follow the story on every re-send (the fanout only re-sends
+              // changed items); counters and the featured flag are the site's once it exists
+              $set: { ...fields, updatedAt: now },
+              $setOnInsert: { views, comments, featured, createdAt: now },
             },
             upsert: true,
           },
@@ -119,9 +132,15 @@ export const getPaginatedBlogs = async (req, res) => {
 
 export const getBlogById = async (req, res) => {
   try {
-    const blog = await Blog.findById(req.params.id)
+    const blog = await Blog.findById(req.params.id).lean()
     if (!blog) return res.status(404).json({ error: "Blog not found" })
-    res.json(blog)
+    // related stories that landed in this collection, best first, as links for the page
+    const found = blog.related?.length
+      ? await Blog.find({ reference_id: { $in: blog.related } }, "reference_id title image date readTime").lean()
+      : []
+    const rank = new Map(blog.related?.map((ref, i) => [ref, i]))
+    const relatedItems = found.sort((a, b) => rank.get(a.reference_id) - rank.get(b.reference_id))
+    res.json({ ...blog, relatedItems })
   } catch (err) {
     res.status(500).json({ error: err.message })
   }
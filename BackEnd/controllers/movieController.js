@@ -19,16 +19,31 @@ export const bulkCreateMovies = async (req, res) => {
       return res.status(200).json({ ok: true, inserted: 0, upserted: 0 })
     }
 
+    // items carry their content hash as idempotency_key (Scrapper/bulk_poster.py);
+    // one whose stored key matches was already applied, e.g. a retried 413 half
+    const refs = items.filter((it) => it?.reference_id && it.idempotency_key).map((it) => it.reference_id)
+    const stored = refs.length
+      ? new Map((await Movie.find({ reference_id: { $in: refs } }, { reference_id: 1, idempotency_key: 1 }).lean())
+          .map((d) => [d.reference_id, d.idempotency_key]))
+      : new Map()
+    const fresh = items.filter((it) => !(it?.idempotency_key && stored.get(it.reference_id) === it.idempotency_key))
+    if (!fresh.length) {
+      return res.status(200).json({ ok: true, inserted: 0, upserted: 0, replayed: items.length })
+    }
+
     const now = new Date()
-    const ops = items.map((it) => {
+    const ops = fresh.map((it) => {
       if (it && typeof it.reference_id === "string" && it.reference_id.trim() !== "") {
         // Upsert by reference_id
+        const { views, comments, featured, createdAt, updatedAt, ...fields } = it
         return {
           updateOne: {
             filter: { reference_id: it.reference_id },
             update: {
-              $setOnInsert: { ...it, createdAt: now },
-              $set: { updatedAt: now }
+              // projected fields follow the story on every re-send (the fanout only re-sends
+              // changed items); counters and the featured flag are the site's once it exists
+              $set: { ...fields, updatedAt: now },
+              $setOnInsert: { views, comments, featured, createdAt: now }
             },
             upsert: true
           }
@@ -44,7 +59,8 @@ export const bulkCreateMovies = async (req, res) => {
       inserted: result.insertedCount || 0,
       upserted: result.upsertedCount || 0,
       matched: result.matchedCount || 0,
-      modified: result.modifiedCount || 0
+      modified: result.modifiedCount || 0,
+      replayed: items.length - fresh.length
     })
   } catch (err) {
     if (err?.code === 11000) {
@@ -107,9 +123,15 @@ export const getPaginatedMovies = async (req, res) => {
 // Get movie article by ID
 export const getMovieById = async (req, res) => {
   try {
-    const movie = await Movie.findById(req.params.id)
+    const movie = await Movie.findById(req.params.id).lean()
     if (!movie) return res.status(404).json({ error: "Movie not found" })
-    res.json(movie)
+    // related stories that landed in this collection, best first, as links for the page
+    const found = movie.related?.length
+      ? await Movie.find({ reference_id: { $in: movie.related } }, "reference_id title thumbnail date readTime").lean()
+      : []
+    const rank = new Map(movie.related?.map((ref, i) => [ref, i]))
+    const relatedItems = found.sort((a, b) => rank.get(a.reference_id) - rank.get(b.reference_id))
+    res.json({ ...movie, relatedItems })
   } catch (err) {
     res.status(500).json({ error: err.message })
   }
@@ -2,21 +2,54 @@
 import Story from "../models/Story.js"
 import mongoose from "mongoose"
 
+// Same match priority for inserts and later patches of a story
+function storyFilter(it) {
+  return (
+    (it.canonicalUrl && { canonicalUrl: it.canonicalUrl }) ||
+    (it.source && it.guid && { source: String(it.source), guid: String(it.guid) }) ||
+    (it.fingerprint && { fingerprint: it.fingerprint }) ||
+    null
+  )
+}
+
+// The ingest sends `related` as fingerprints (Scrapper/related_index.py). Stored as
+// the related stories' _ids, which the fanout projects as the collections'
+// reference_ids. Only a changed list is written, so updatedAt (the fanout
+// watermark) doesn't move on re-sends.
+async function linkRelated(items, now) {
+  const fps = [...new Set(items.flatMap((it) => it.related || []))]
+  if (!fps.length) return
+  const found = await Story.find({ fingerprint: { $in: fps } }, { fingerprint: 1 }).lean()
+  const idOf = new Map(found.map((s) => [s.fingerprint, String(s._id)]))
+  const ops = []
+  for (const it of items) {
+    const filter = storyFilter(it)
+    const ids = (it.related || []).map((fp) => idOf.get(fp)).filter(Boolean)
+    if (!filter || !ids.length) continue
+    ops.push({
+      updateOne: {
+        filter: { ...filter, related: { $ne: ids } },
+        update: { $set: { related: ids, updatedAt: now } },
+        timestamps: false,
+      },
+    })
+  }
+  if (ops.length) await Story.bulkWrite(ops, { ordered: false })
+}
+
 export const bulkUpsertStories = async (req, res) => {
+  const items = Array.isArray(req.body) ? req.body : (req.body.items || [])
+  const now = new Date()
   try {
-    const items = Array.isArray(req.body) ? req.body : (req.body.items || [])
     if (!items.length) return res.status(200).json({ ok: true, n: 0 })
 
-    const now = new Date()
     const ops = items.map((it) => {
       // Normalize dates into Date objects
       const publishedAt = it.publishedAt ? new Date(it.publishedAt) : undefined
 
       // Build filter by priority
       const filter =
-        (it.canonicalUrl && { canonicalUrl: it.canonicalUrl }) ||
-        (it.source && it.guid && { source: String(it.source), guid: String(it.guid) }) ||
-        (it.fingerprint && { fingerprint: it.fingerprint }) ||
+        storyFilter(it) ||
         // As a last resort (if client didn’t send precomputed keys),
         // rely on schema’s pre-validate to compute fingerprint:
         { title: it.title, link: it.link }
@@ -30,6 +63,8 @@ export const bulkUpsertStories = async (req, res) => {
               summary: it.summary,
               content: it.content,
               image: it.image,
+              imageStatus: it.imageStatus,   // "pending" while the scrapper's image queue validates it
+              imageVariants: it.imageVariants,
               link: it.link,
               canonicalUrl: it.canonicalUrl, // will be filled by pre-validate if missing
               source: it.source,
@@ -39,21 +74,21 @@ export const bulkUpsertStories = async (req, res) => {
               tags: it.tags || [],
               publishedAt,
               createdAt: now,
-            },
-            $set: {
-              // update rolling fields each run if you want (image/title can drift)
               updatedAt: now,
-              // example: keep category/tags fresh
-              // category: it.category,
-              // tags: it.tags || [],
             },
+            // example: keep category/tags fresh (image/title can drift)
+            // $set: { category: it.category, tags: it.tags || [] },
           },
           upsert: true,
+          // updatedAt only moves when a story actually changes (insert, image patch),
+          // so the fanout can use it as its incremental watermark
+          timestamps: false,
         },
       }
     })
 
     const result = await Story.bulkWrite(ops, { ordered: false })
+    await linkRelated(items, now)
     res.status(200).json({
       ok: true,
       upserted: result.upsertedCount || 0,
@@ -62,18 +97,78 @@ export const bulkUpsertStories = async (req, res) => {
     })
   } catch (err) {
     if (err?.code === 11000) {
+      // unordered: the other items were written; the client won't resend them
+      await linkRelated(items, now).catch(() => {})
       return res.status(409).json({ ok: false, code: "DUP_KEY", error: err.message })
     }
     res.status(500).json({ ok: false, error: err.message })
   }
 }
 
+// PATCH /api/stories/bulk/images — deferred image resolution from the scrapper's
+// image queue. Items: { canonicalUrl|source+guid|fingerprint, image, imageStatus,
+// expect? }. With `expect` the patch only applies while the story still carries the
+// unvalidated candidate it was posted with, so a newer image is never overwritten.
+export const bulkUpdateStoryImages = async (req, res) => {
+  try {
+    const items = Array.isArray(req.body) ? req.body : (req.body.items || [])
+    const now = new Date()
+    const ops = []
+    for (const it of items) {
+      const filter = storyFilter(it)
+      if (!filter) continue
+      if (it.expect !== undefined) filter.image = it.expect
+      const set = { image: it.image ?? null, imageStatus: it.imageStatus || "ok", updatedAt: now }
+      if (it.imageVariants !== undefined) set.imageVariants = it.imageVariants
+      ops.push({ updateOne: { filter, update: { $set: set } } })
+    }
+    if (!ops.length) return res.status(200).json({ ok: true, n: 0 })
+
+    const result = await Story.bulkWrite(ops, { ordered: false })
+    res.status(200).json({
+      ok: true,
+      matched: result.matchedCount || 0,
+      modified: result.modifiedCount || 0,
+    })
+  } catch (err) {
+    res.status(500).json({ ok: false, error: err.message })
+  }
+}
+
+const PAGE_MAX = 1000
+
+// Incremental reads for the fanout: ascending by (updatedAt, _id), resuming after
+// an opaque "<updatedAt ISO>|<_id>" cursor, so stories changed after insert (e.g.
+// image patches) are projected again. Returns { items, page: { nextCursor } }.
+async function storiesAfterCursor(q) {
+  const limit = Math.min(Math.max(parseInt(q.limit, 10) || 200, 1), PAGE_MAX)
+  let [ts, id] = String(q.cursor || "").split("|")
+  if (!ts && q.since) ts = String(q.since)
+
+  const filter = {}
+  if (ts) {
+    const at = new Date(ts)
+    if (isNaN(at.getTime())) throw Object.assign(new Error("bad cursor"), { status: 400 })
+    filter.$or = [{ updatedAt: { $gt: at } }]
+    if (id && mongoose.isValidObjectId(id)) {
+      filter.$or.push({ updatedAt: at, _id: { $gt: new mongoose.Types.ObjectId(id) } })
+    }
+  }
+
+  const items = await Story.find(filter).sort({ updatedAt: 1, _id: 1 }).limit(limit).lean()
+  const last = items[items.length - 1]
+  const nextCursor = items.length === limit ? `${last.updatedAt.toISOString()}|${last._id}` : null
+  return { items, page: { nextCursor } }
+}
 
 export const getAllStories = async (req, res) => {
   try {
+    if (req.query.cursor !== undefined || req.query.since !== undefined) {
+      return res.json(await storiesAfterCursor(req.query))
+    }
     const stories = await Story.find().sort({ createdAt: -1 })
     res.json(stories)
   } catch (err) {
-    res.status(500).json({ error: err.message })
+    res.status(err.status || 500).json({ error: err.message })
   }
-}
\ No newline at end of file
+}
@@ -3,16 +3,19 @@ import mongoose from "mongoose"
 
 const blogSchema = new mongoose.Schema({
   reference_id: String, // Unique identifier for the blog post
+  idempotency_key: String, // content hash of the last applied item (bulk upserts skip replays)
   title: String,
   description: String,
   content: [String],
   contentImages: [{ index: Number, url: String, alt: String }],
   image: String,
+  imageVariants: mongoose.Schema.Types.Mixed, // { srcUrl: { variants: { width: url }, blur } }
   author: String,
   date: String,
   readTime: String,
   category: String,
   tags: [String],
+  related: [String], // reference_ids of related stories (projected from Story.related)
   views: String,
   comments: Number,
   featured: Boolean,
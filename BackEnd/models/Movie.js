@@ -4,6 +4,7 @@ import mongoose from "mongoose"
 const movieSchema = new mongoose.Schema(
   {
     reference_id: String, // Unique identifier for dedupe/upsert (optional)
+    idempotency_key: String, // content hash of the last applied item (bulk upserts skip replays)
 
     title: { type: String, required: true },
     description: String,
@@ -12,12 +13,14 @@ const movieSchema = new mongoose.Schema(
     contentImages: [{ index: Number, url: String, alt: String }],
     images: [String],
     thumbnail: String,
+    imageVariants: mongoose.Schema.Types.Mixed, // { srcUrl: { variants: { width: url }, blur } }
 
     author: String,
     date: String,
     readTime: String,
     category: String,
     tags: [String],
+    related: [String], // reference_ids of related stories (projected from Story.related)
 
     views: { type: Number, default: 0 },
     comments: { type: Number, default: 0 },
@@ -4,6 +4,7 @@ import mongoose from "mongoose"
 const sportSchema = new mongoose.Schema(
   {
     reference_id: String, // optional unique key for idempotent upsert
+    idempotency_key: String, // content hash of the last applied item (bulk upserts skip replays)
 
     title: { type: String, required: true },
     description: { type: String },
@@ -12,12 +13,14 @@ const sportSchema = new mongoose.Schema(
 
     images: [String],
     thumbnail: String,
+    imageVariants: mongoose.Schema.Types.Mixed, // { srcUrl: { variants: { width: url }, blur } }
 
     author: String,
     date: String,
     readTime: String,
     category: String,  // "Match Report", "Opinion", "News", ...
     tags: [String],
+    related: [String], // reference_ids of related stories (projected from Story.related)
 
     views: { type: Number, default: 0 },
     comments: { type: Number, default: 0 },
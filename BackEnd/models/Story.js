@@ -34,6 +34,8 @@ const storySchema = new mongoose.Schema({
   summary: String,
   content: [String],
   image: String,
+  imageStatus: String,        // "pending" (unvalidated candidate) | "ok" | "none", set by the image queue
+  imageVariants: mongoose.Schema.Types.Mixed, // pre-sized WebP variants from the scrapper
 
   // Source + identity
   link: String,               // raw link as provided (optional to store)
@@ -45,6 +47,7 @@ const storySchema = new mongoose.Schema({
   // Classification
   category: String,           // "sports" | "movies" | "blogs" | etc.
   tags: [String],
+  related: [String],          // _ids of related stories; the ingest sends fingerprints (see linkRelated)
 
   // Dates
   publishedAt: Date,
@@ -54,6 +57,7 @@ const storySchema = new mongoose.Schema({
 storySchema.index({ canonicalUrl: 1 }, { unique: true, sparse: true })
 storySchema.index({ source: 1, guid: 1 }, { unique: true, sparse: true })
 storySchema.index({ fingerprint: 1 }, { unique: true }) // always present
+storySchema.index({ updatedAt: 1, _id: 1 })              // incremental fanout cursor
 
 storySchema.pre("validate", function (next) {
   if (this.link && !this.canonicalUrl) this.canonicalUrl = canonicalizeUrl(this.link)
@@ -1,10 +1,11 @@
 // routes/story.js
 import express from "express"
-import { bulkUpsertStories,getAllStories } from "../controllers/storyController.js"
+import { bulkUpsertStories, bulkUpdateStoryImages, getAllStories } from "../controllers/storyController.js"
 
 const router = express.Router()
 
 router.get("/", getAllStories) // GET /api/stories
 router.post("/bulk", bulkUpsertStories)
+router.patch("/bulk/images", bulkUpdateStoryImages) // deferred image resolution (Scrapper/image_queue.py)
 
 export default router
@@ -0,0 +1,34 @@
+# article_text.py
+# Paragraphs of one article stored once: per-paragraph word counts and a single
+# joined buffer, so word totals, summary, read time, keywords and category
+# guesses all read the same data instead of re-splitting / re-joining.
+from array import array
+
+class ArticleText:
+    __slots__ = ("paras", "counts", "text", "words", "_lower")
+
+    def __init__(self, paras: list[str] | None = None):
+        self.paras = list(paras or [])
+        self.counts = array("I", (len(p.split()) for p in self.paras))
+        self.text = " ".join(self.paras)
+        self.words = sum(self.counts)
+        self._lower = None
+
+    def __len__(self) -> int:
+        return len(self.paras)
+
+    def __bool__(self) -> bool:
+        return bool(self.paras)
+
+    @property
+    def lower(self) -> str:
+        """Lowercased buffer, computed on first use."""
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    def summary(self, limit: int = 2000) -> str:
+        return self.text[:limit]
+
+    def read_minutes(self, wpm: int, n_images: int = 0, img_seconds: int = 0) -> float:
+        return self.words / wpm + (n_images * img_seconds) / 60.0
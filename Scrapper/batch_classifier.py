@@ -0,0 +1,219 @@
+# batch_classifier.py
+# Batch story classifier for the fanout: a whole batch is tokenized and hashed in
+# NumPy, and a (vocab x label) weight matrix turns token ids into per-label scores.
+# Trained from the documents already in the movies/blogs/sports collections.
+# Not a speedup: scoring is ~2x slower than the substring rules in classify(), and
+# with only the cue words it is a slower copy of them, so the fanout uses it only
+# once a model is saved. What it buys is vocabulary the cue lists lack;
+# bench/bench_classifier.py reports held-out accuracy (use --stories on a dump).
+import os, re, json
+from urllib.parse import urljoin
+
+try:
+    import numpy as np
+    NUMPY_OK = True
+except Exception:
+    NUMPY_OK = False
+
+MODEL_PATH = os.getenv("CLASSIFIER_MODEL", ".cache/classifier.json")
+LABELS     = ("sports", "movies", "blogs")          # tie-break order matches classify()
+MIN_SCORE  = float(os.getenv("CLASSIFIER_MIN_SCORE", "0.5"))
+
+SEP = "\x00"
+TOKEN_RE = re.compile(r"[a-z0-9\-\x80-\U0010ffff]+|\x00")     # same token rule as _token_hashes
+
+CATEGORY_LABELS = {
+    "movies": "movies", "movie": "movies", "entertainment": "movies", "film": "movies",
+    "blogs": "blogs", "blog": "blogs", "opinion": "blogs", "feature": "blogs", "analysis": "blogs",
+    "sports": "sports", "sport": "sports",
+}
+
+# byte classes for the vectorized tokenizer: [a-z0-9-] and any non-ASCII byte
+_TOKEN_BYTE = None
+_POW = None
+HASH_MAX_LEN = 64
+
+def _token_hashes(buf: bytes):
+    """
+    Tokenize a SEP-joined, lowercased batch entirely in NumPy.
+    Returns (doc index, start offset, 64-bit polynomial hash) per token.
+    """
+    global _TOKEN_BYTE, _POW
+    if _TOKEN_BYTE is None:
+        _TOKEN_BYTE = np.zeros(256, dtype=bool)
+        for c in b"abcdefghijklmnopqrstuvwxyz0123456789-":
+            _TOKEN_BYTE[c] = True
+        _TOKEN_BYTE[128:] = True
+        _POW = np.power(np.uint64(1099511628211), np.arange(HASH_MAX_LEN, dtype=np.uint64))
+    a = np.frombuffer(buf, dtype=np.uint8)
+    tok = _TOKEN_BYTE[a]
+    ci = np.flatnonzero(tok)                                    # token byte offsets
+    if not len(ci):
+        z = np.zeros(0, dtype=np.int64)
+        return z, z, z.astype(np.uint64)
+    first = np.ones(len(ci), dtype=bool)
+    first[1:] = ci[1:] != ci[:-1] + 1                           # starts a new token
+    starts_c = np.flatnonzero(first)                            # in compressed coords
+    tok_of = np.cumsum(first) - 1
+    pos_in = np.minimum(np.arange(len(ci)) - starts_c[tok_of], HASH_MAX_LEN - 1)
+    with np.errstate(over="ignore"):
+        contrib = a[ci].astype(np.uint64) * _POW[pos_in]
+        h = np.add.reduceat(contrib, starts_c)
+        lens = np.diff(np.append(starts_c, len(ci))).astype(np.uint64)
+        h ^= lens * np.uint64(0x9E3779B97F4A7C15)
+    starts = ci[starts_c]
+    seps = np.flatnonzero(a == 0)
+    docs = np.searchsorted(seps, starts)
+    return docs.astype(np.int64), starts, h
+
+def _doc_text(s: dict) -> str:
+    tags = " ".join(t for t in (s.get("tags") or []) if isinstance(t, str))
+    return f"{s.get('title','')} {s.get('summary','')} {tags} {s.get('source') or ''}".lower()
+
+class BatchClassifier:
+    def __init__(self, vocab: dict[str, int], weights, bias=None):
+        self.vocab = vocab
+        self.W = np.asarray(weights, dtype=np.float32)               # (V, L)
+        self.b = np.zeros(len(LABELS), np.float32) if bias is None else np.asarray(bias, np.float32)
+        # vocab terms as sorted token hashes -> vocab ids (see _token_hashes)
+        terms = list(vocab)
+        _, _, h = _token_hashes(SEP.join(terms).encode("utf-8"))
+        order = np.argsort(h)
+        self._hashes = h[order]
+        self._hash_ids = np.array([vocab[t] for t in terms], dtype=np.int64)[order]
+
+    @classmethod
+    def from_cues(cls, cues: dict[str, set[str]]) -> "BatchClassifier":
+        vocab: dict[str, int] = {}
+        rows = []
+        for j, label in enumerate(LABELS):
+            for cue in cues.get(label, ()):
+                if cue not in vocab:
+                    vocab[cue] = len(vocab)
+                    rows.append([0.0] * len(LABELS))
+                rows[vocab[cue]][j] = 1.0
+        return cls(vocab, rows or np.zeros((0, len(LABELS))))
+
+    # ---------- batch scoring ----------
+    def token_ids(self, stories: list[dict]):
+        """(doc index, vocab id) arrays for every known token in the batch."""
+        big = SEP.join(_doc_text(s) for s in stories).encode("utf-8")
+        docs, _, h = _token_hashes(big)
+        if not len(h) or not len(self._hashes):
+            return docs[:0], docs[:0]
+        pos = np.minimum(np.searchsorted(self._hashes, h), len(self._hashes) - 1)
+        hit = self._hashes[pos] == h
+        return docs[hit], self._hash_ids[pos[hit]]
+
+    def scores(self, stories: list[dict]):
+        """(n, len(LABELS)) score matrix; each distinct token counts once per story."""
+        n = len(stories)
+        out = np.tile(self.b, (n, 1))
+        if not n or not len(self.vocab):
+            return out
+        docs, ids = self.token_ids(stories)
+        if len(ids):
+            pair = np.unique(docs * len(self.vocab) + ids)             # presence, not frequency
+            docs, ids = pair // len(self.vocab), pair % len(self.vocab)
+            for j in range(len(LABELS)):
+                out[:, j] += np.bincount(docs, weights=self.W[ids, j], minlength=n)
+        return out
+
+    def classify_batch(self, stories: list[dict]) -> list[list[str]]:
+        """Labels per story: explicit category wins (as in classify()), else best score."""
+        sc = self.scores(stories)
+        best = sc.argmax(axis=1) if len(stories) else []
+        out = []
+        for i, s in enumerate(stories):
+            cat = CATEGORY_LABELS.get((s.get("category") or "").lower())
+            if cat:
+                out.append([cat])
+            elif sc[i, best[i]] >= MIN_SCORE:
+                out.append([LABELS[best[i]]])
+            else:
+                out.append([])
+        return out
+
+    # ---------- training ----------
+    @classmethod
+    def fit(cls, stories: list[dict], labels: list[str], min_df: int = 3, alpha: float = 1.0) -> "BatchClassifier":
+        """
+        Bernoulli-style NB weights from labeled stories (one label each): features are
+        token presence per document, and only present tokens are scored.
+        """
+        big = SEP.join(_doc_text(s) for s in stories)
+        df: dict[str, int] = {}
+        docs_tokens: list[set[str]] = [set()]
+        for t in TOKEN_RE.findall(big):
+            if t == SEP:
+                docs_tokens.append(set())
+            elif t not in docs_tokens[-1]:
+                docs_tokens[-1].add(t)
+                df[t] = df.get(t, 0) + 1
+        vocab = {t: i for i, t in enumerate(sorted(t for t, c in df.items() if c >= min_df))}
+        counts = np.full((len(vocab), len(LABELS)), alpha, dtype=np.float64)
+        prior = np.full(len(LABELS), alpha)
+        for toks, lab in zip(docs_tokens, labels):
+            if lab not in LABELS:
+                continue
+            j = LABELS.index(lab)
+            prior[j] += 1
+            idx = [vocab[t] for t in toks if t in vocab]
+            counts[idx, j] += 1
+        p = counts / prior                                 # P(token present | label)
+        logp = np.log(p)
+        W = logp - logp.mean(axis=1, keepdims=True)         # relative evidence per label
+        b = np.log(prior / prior.sum())
+        return cls(vocab, W.astype(np.float32), (b - b.mean()).astype(np.float32))
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"labels": LABELS, "vocab": self.vocab, "W": self.W.tolist(), "b": self.b.tolist()}, f)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "BatchClassifier | None":
+        try:
+            with open(path, encoding="utf-8") as f:
+                m = json.load(f)
+        except Exception:
+            return None
+        if tuple(m.get("labels") or ()) != LABELS:
+            return None
+        return cls(m["vocab"], m["W"], m["b"])
+
+def fetch_labeled(api_base: str, endpoints: dict[str, str], ua: str, timeout: int) -> tuple[list[dict], list[str]]:
+    """
+    Labeled training docs from the collections the fanout already filled
+    (GET on each bulk endpoint without /bulk). Movie/Sport/Blog fields are
+    mapped back onto the story fields the classifier reads.
+    """
+    import requests
+    from json_stream import iter_json_items
+    stories, labels = [], []
+    for label, ep in endpoints.items():
+        url = urljoin(api_base, ep.rsplit("/bulk", 1)[0])
+        with requests.get(url, headers={"User-Agent": ua}, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            for d in iter_json_items(r.iter_content(64 * 1024)):
+                stories.append({"title": d.get("title"), "summary": d.get("description"), "tags": d.get("tags") or []})
+                labels.append(label)
+    return stories, labels
+
+def default_classifier() -> "BatchClassifier | None":
+    """Trained model if one was saved; None without NumPy or a model (use the rules)."""
+    if not NUMPY_OK:
+        return None
+    return BatchClassifier.load()
+
+if __name__ == "__main__":
+    # python batch_classifier.py  -> train from the movies/blogs/sports collections and save
+    import fanout_to_collections_enhanced as fo
+    docs, labs = fetch_labeled(fo.API_BASE, {"movies": fo.MOVIES_BULK, "blogs": fo.BLOGS_BULK, "sports": fo.SPORTS_BULK},
+                               fo.UA, fo.TIMEOUT)
+    print(f"training on {len(docs)} labeled documents")
+    model = BatchClassifier.fit(docs, labs)
+    model.save()
+    print(f"saved {len(model.vocab)} terms -> {MODEL_PATH}")
@@ -0,0 +1,101 @@
+# bench/bench_classifier.py
+# Throughput + accuracy of batch_classifier against the rule-based classify()
+# functions of both fanout scripts. The truth label is the story's category
+# (CATEGORY_LABELS); it is blanked before scoring, so every classifier has to
+# get the label from the text. The trained model is fit on the first half and
+# scored on the second half only.
+#   python bench/bench_classifier.py [--n 20000] [--stories dump.json] [--batch 1000]
+import os, sys, json, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fanout_to_collections_enhanced as fanout
+import projector_all_stories as projector
+from batch_classifier import BatchClassifier, CATEGORY_LABELS
+
+FILLER = ("the a report says after new season first week city team fans star show said year "
+          "people world game night release plans story latest watch big top best").split()
+# topic words the hand-written cue lists do not have (what a trained vocab can pick up)
+TOPIC_WORDS = {
+    "sports": "striker goalkeeper innings wicket playoff coach referee quarterback transfer league".split(),
+    "movies": "actor actress director sequel premiere screenplay streaming studio cast oscar".split(),
+    "blogs": "i my thoughts why lessons personal newsletter argue believe perspective".split(),
+}
+CATEGORY_OF = {"sports": ["sports", "sport"], "movies": ["movies", "film", "entertainment"],
+               "blogs": ["blogs", "opinion", "feature"], "": ["news", ""]}
+
+def synth_stories(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    cues = {"sports": sorted(fanout.SPORTS_CUES), "movies": sorted(fanout.MOVIE_CUES), "blogs": sorted(fanout.BLOG_CUES)}
+    out = []
+    for i in range(n):
+        topic = rnd.choice(["sports", "movies", "blogs", ""])
+        words = rnd.choices(FILLER, k=rnd.randint(20, 60))
+        inserts = []
+        if topic:
+            inserts += rnd.choices(cues[topic], k=rnd.randint(0, 2))
+            inserts += rnd.choices(TOPIC_WORDS[topic], k=rnd.randint(1, 4))
+        if rnd.random() < 0.15:                               # off-topic cue ("review" in a match report)
+            inserts.append(rnd.choice(cues[rnd.choice(list(cues))]))
+        for w in inserts:
+            words.insert(rnd.randrange(len(words)), w)
+        out.append({
+            "_id": f"{i:024x}",
+            "title": " ".join(words[:10]).title(),
+            "summary": " ".join(words),
+            "tags": rnd.sample(words, 3),
+            "category": rnd.choice(CATEGORY_OF[topic]),
+            "source": rnd.choice(["ESPN", "Variety", "Medium", "Reuters", ""]),
+        })
+    return out
+
+def timed(fn, *a):
+    t0 = time.perf_counter()
+    res = fn(*a)
+    return res, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--stories", help="JSON array of stories (e.g. a saved /api/stories response)")
+    ap.add_argument("--batch", type=int, default=1000)
+    args = ap.parse_args()
+
+    stories = json.load(open(args.stories, encoding="utf-8")) if args.stories else synth_stories(args.n)
+    truth = [CATEGORY_LABELS.get((s.get("category") or "").lower(), "") for s in stories]
+    blind = [{**s, "category": ""} for s in stories]
+    half = len(stories) // 2
+    train, test = blind[:half], blind[half:]
+    n = len(test)
+
+    cue_model = BatchClassifier.from_cues({"sports": fanout.SPORTS_CUES, "movies": fanout.MOVIE_CUES,
+                                           "blogs": fanout.BLOG_CUES})
+    trained, tfit = timed(BatchClassifier.fit, [s for s, t in zip(train, truth) if t], [t for t in truth[:half] if t])
+
+    def batched(clf):
+        return lambda: [sorted(l) for i in range(0, n, args.batch) for l in clf.classify_batch(test[i:i + args.batch])]
+
+    runs = {
+        "fanout classify()":    timed(lambda: [sorted(fanout.classify(s)) for s in test]),
+        "projector classify()": timed(lambda: [sorted(projector.classify(s)) for s in test]),
+        "batch, cue words":     timed(batched(cue_model)),
+        "batch, trained":       timed(batched(trained)),
+    }
+    gold = truth[half:]
+    labeled = [i for i, t in enumerate(gold) if t]
+
+    def accuracy(pred):
+        # one truth label per story: a hit needs exactly that label ([] for "news")
+        return sum(1 for i in range(n) if pred[i] == ([gold[i]] if gold[i] else [])) / max(n, 1)
+
+    def recall(pred):
+        return sum(1 for i in labeled if gold[i] in pred[i]) / max(len(labeled), 1)
+
+    print(f"{len(stories)} stories ({half} train / {n} test), batch size {args.batch}, "
+          f"trained vocab {len(trained.vocab)} in {tfit:.2f}s, cue vocab {len(cue_model.vocab)}")
+    ta = runs["fanout classify()"][1]
+    for name, (pred, t) in runs.items():
+        print(f"  {name:22s}{n / t:12,.0f} stories/s ({ta / t:4.1f}x fanout)  "
+              f"accuracy {accuracy(pred):6.1%}  recall {recall(pred):6.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# bench/bench_extract.py
+# Golden-output and latency/allocation check for the extraction helpers over the
+# checked-in pages in bench/corpus. Fails (exit 1) when any output differs from
+# corpus/golden.json, or when a function's peak allocation grows past --threshold
+# over corpus/baseline.json. Latency is compared in units of a calibration pass
+# interleaved with the timed rounds (so another machine is not a slowdown); it only
+# fails the run with --gate-time, and never for functions under --min-ms.
+#   python bench/bench_extract.py [--only cheap_keywords] [--threshold 0.25] [--gate-time]
+#   python bench/bench_extract.py --update-golden      # after an intended output change
+#   python bench/bench_extract.py --update-baseline    # new machine / accepted perf change
+import os, sys, gc, json, time, argparse, tracemalloc
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+CORPUS   = os.path.join(HERE, "bench", "corpus")
+GOLDEN   = os.path.join(CORPUS, "golden.json")
+BASELINE = os.path.join(CORPUS, "baseline.json")
+
+from bs4 import BeautifulSoup
+import ingest_feeds_enhanced as ing
+import rss_reader
+import image_resolver
+from article_text import ArticleText
+
+def load_corpus() -> list[tuple[str, str, str]]:
+    with open(os.path.join(CORPUS, "urls.json"), encoding="utf-8") as f:
+        urls = json.load(f)
+    docs = []
+    for name in sorted(os.listdir(CORPUS)):
+        if name.endswith(".html"):
+            with open(os.path.join(CORPUS, name), encoding="utf-8") as f:
+                docs.append((name, f.read(), urls.get(name, "https://example.com/")))
+    return docs
+
+def plain_text(html: str) -> str:
+    return BeautifulSoup(html, "lxml").get_text("\n")
+
+# name -> (prepare(html, url) -> fixture, run(fixture) -> JSON-able output)
+# prepare runs outside the timed region; each run() starts from scratch (fresh
+# ArticleText / soup), which is what the pipeline pays per story.
+CASES = {
+    "extract_paragraphs_and_images": (lambda html, url: html,
+                                      lambda html: list(ing.extract_paragraphs_and_images(html))),
+    "extract_paragraphs_from_html":  (lambda html, url: html, rss_reader.extract_paragraphs_from_html),
+    "split_paragraphs_plain":        (lambda html, url: plain_text(html), ing.split_paragraphs_plain),
+    "cheap_keywords":                (lambda html, url: ing.extract_paragraphs_and_images(html)[0],
+                                      lambda paras: ing.cheap_keywords(ArticleText(paras))),
+    "image_candidates":              (lambda html, url: (html, url),
+                                      lambda a: image_resolver._candidates(BeautifulSoup(a[0], "lxml"), a[1])),
+}
+
+def percentile(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+CALIBRATION_PAGE = "<div>" + "<p class='c'>some words <a href='/x'>a link</a> and more words</p>" * 300 + "</div>"
+
+def calibration_pass() -> None:
+    """Fixed mix of lxml parsing and interpreter work, the same kind the helpers do."""
+    from lxml import html as lxml_html
+    words: dict[str, int] = {}
+    for el in lxml_html.fromstring(CALIBRATION_PAGE).iter():
+        for w in (el.text_content() or "").lower().split():
+            words[w] = words.get(w, 0) + 1
+
+def time_case(run, fixtures: list, min_secs: float, min_rounds: int) -> tuple[list[float], list[float]]:
+    """
+    Per-round seconds for one pass over every fixture, and per-round ratios to a
+    calibration pass run right after it; the ratio cancels machine speed and drift.
+    """
+    for fx in fixtures:                   # warm-up (regex compiles, lazy imports)
+        run(fx)
+    calibration_pass()
+    rounds, ratios, t_start = [], [], time.perf_counter()
+    while len(rounds) < min_rounds or time.perf_counter() - t_start < min_secs:
+        t0 = time.perf_counter()
+        for fx in fixtures:
+            run(fx)
+        t1 = time.perf_counter()
+        calibration_pass()
+        rounds.append(t1 - t0)
+        ratios.append((t1 - t0) / (time.perf_counter() - t1))
+    return rounds, ratios
+
+def alloc_case(run, fixtures: list) -> int:
+    """
+    Largest per-call peak of traced memory over the corpus, in bytes. The cyclic GC
+    is off during each call (soup trees are cyclic), so the number does not depend
+    on when a collection happens to run.
+    """
+    peak = 0
+    tracemalloc.start()
+    try:
+        for fx in fixtures:
+            gc.collect()
+            gc.disable()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            try:
+                run(fx)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+            finally:
+                gc.enable()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def first_diff(a, b, path: str = "") -> str:
+    if type(a) is not type(b):
+        return f"{path or '.'}: {type(a).__name__} != {type(b).__name__}"
+    if isinstance(a, dict):
+        for k in sorted(set(a) | set(b)):
+            if k not in a or k not in b:
+                return f"{path}.{k}: missing on one side"
+            if a[k] != b[k]:
+                return first_diff(a[k], b[k], f"{path}.{k}")
+    if isinstance(a, list):
+        for i, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                return first_diff(x, y, f"{path}[{i}]")
+        return f"{path}: length {len(a)} != {len(b)}"
+    return f"{path or '.'}: {str(a)[:80]!r} != {str(b)[:80]!r}"
+
+def load_json(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_json(path: str, data: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", action="append", choices=list(CASES), help="restrict to these functions")
+    ap.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                    help="allowed growth over baseline, 0.25 = +25%%")
+    ap.add_argument("--min-secs", type=float, default=1.0, help="minimum timed seconds per function")
+    ap.add_argument("--min-rounds", type=int, default=20)
+    ap.add_argument("--gate-time", action="store_true", help="also fail on p50 growth (calibrated)")
+    ap.add_argument("--min-ms", type=float, default=1.0,
+                    help="p50 below this is timer noise and never gated")
+    ap.add_argument("--update-golden", action="store_true")
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+
+    docs = load_corpus()
+    golden, baseline = load_json(GOLDEN), load_json(BASELINE)
+    failures = []
+    print(f"{len(docs)} pages; threshold +{args.threshold:.0%}" + ("" if args.gate_time else "; time not gated"))
+    print(f"{'function':32} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KB':>9}  vs baseline")
+
+    for name in args.only or list(CASES):
+        prepare, run = CASES[name]
+        fixtures = [prepare(html, url) for _, html, url in docs]
+
+        # outputs: JSON round trip so tuples/lists compare the way they are stored
+        got = {doc: json.loads(json.dumps(run(fx))) for (doc, _, _), fx in zip(docs, fixtures)}
+        if args.update_golden:
+            golden[name] = got
+        else:
+            for doc, out in got.items():
+                want = golden.get(name, {}).get(doc)
+                if want is None:
+                    failures.append(f"{name}/{doc}: no golden output (run --update-golden)")
+                elif out != want:
+                    failures.append(f"{name}/{doc}: output drift at {first_diff(out, want)}")
+
+        rounds, ratios = time_case(run, fixtures, args.min_secs, args.min_rounds)
+        p50, p90, p99 = (percentile(rounds, q) * 1000 for q in (0.5, 0.9, 0.99))
+        rel = percentile(ratios, 0.5)
+        peak = alloc_case(run, fixtures)
+
+        base = baseline.get(name)
+        note = ""
+        if args.update_baseline:
+            baseline[name] = {"p50_ms": round(p50, 3), "p50_rel": round(rel, 4), "peak_bytes": peak}
+        elif base:
+            # calibrated when the baseline has a ratio, raw ms otherwise
+            dt = rel / base["p50_rel"] - 1 if base.get("p50_rel") else p50 / base["p50_ms"] - 1
+            dm = peak / max(base["peak_bytes"], 1) - 1
+            note = f"{dt:+.0%} time, {dm:+.0%} peak"
+            if args.gate_time and dt > args.threshold and base["p50_ms"] >= args.min_ms:
+                failures.append(f"{name}: p50 {p50:.2f}ms is {dt:+.0%} over baseline {base['p50_ms']:.2f}ms (calibrated)")
+            if dm > args.threshold:
+                failures.append(f"{name}: peak {peak // 1024}KB is {dm:+.0%} over baseline {base['peak_bytes'] // 1024}KB")
+        else:
+            note = "no baseline"
+        print(f"{name:32} {p50:9.2f} {p90:9.2f} {p99:9.2f} {peak / 1024:9.0f}  {note}")
+
+    if args.update_golden:
+        save_json(GOLDEN, golden)
+        print("golden outputs written to", os.path.relpath(GOLDEN, HERE))
+    if args.update_baseline:
+        save_json(BASELINE, baseline)
+        print("baseline written to", os.path.relpath(BASELINE, HERE))
+    if failures:
+        print("\nFAIL")
+        for f in failures:
+            print("  " + f)
+        raise SystemExit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench/bench_fanout.py
+# End-to-end fanout throughput against local_api.py: seeds N synthetic stories in a
+# stand-in server (separate process, so its memory is not counted), runs one of the
+# fanout scripts' main() in-process and reports stories/s, bytes posted and memory.
+#   python bench/bench_fanout.py [--n 5000] [--script enhanced|projector] [--latency 0.01]
+#                                [--error-rate 0.05] [--body-limit 1000000] [--runs 2]
+import os, sys, json, time, socket, argparse, tempfile, subprocess, tracemalloc, importlib
+import contextlib, io
+import requests
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+SCRIPTS = {"enhanced": "fanout_to_collections_enhanced", "projector": "projector_all_stories"}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_up(base: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError("local_api.py exited")
+        try:
+            requests.get(base + "/_stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError("local_api.py did not come up")
+
+def run_once(mod, base: str) -> dict:
+    before = requests.get(base + "/_stats", timeout=5).json()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = io.StringIO()
+    err = None
+    with contextlib.redirect_stdout(out):
+        try:
+            mod.main()
+        except Exception as e:          # e.g. bulk post failures under --error-rate
+            err = e
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = requests.get(base + "/_stats", timeout=5).json()
+    fetched = next((int(l.split()[1]) for l in out.getvalue().splitlines() if l.startswith("fetched ")), 0)
+    return {
+        "secs": elapsed, "fetched": fetched, "peak": peak, "error": err,
+        **{k: after[k] - before[k] for k in ("requests", "bytes", "items", "413", "409", "500")},
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5000)
+    ap.add_argument("--script", choices=sorted(SCRIPTS), default="enhanced")
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--conflict-rate", type=float, default=0.0)
+    ap.add_argument("--body-limit", type=int, default=50 << 20)
+    ap.add_argument("--runs", type=int, default=2, help="run 2+ shows the ledger skipping unchanged items")
+    args = ap.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "local_api.py"), "--port", str(port),
+                             "--stories", str(args.n), "--latency", str(args.latency),
+                             "--error-rate", str(args.error_rate), "--conflict-rate", str(args.conflict_rate),
+                             "--body-limit", str(args.body_limit)],
+                            stdout=subprocess.DEVNULL)
+    tmp = tempfile.mkdtemp(prefix="bench_fanout_")
+    try:
+        wait_up(base, proc)
+        # fresh state per benchmark: the scripts read these at import time
+        os.environ.update({
+            "API_BASE": base,
+            # the projector posts to production by default; keep it on the stand-in
+            "MOVIES_BULK": "/api/movies/bulk",
+            "BLOGS_BULK": "/api/blogs/bulk",
+            "SPORTS_BULK": "/api/sports/bulk",
+            "FANOUT_LEDGER": os.path.join(tmp, "ledger.sqlite3"),
+            "FANOUT_STATE": os.path.join(tmp, "state.json"),
+        })
+        for m in ("bulk_poster", "fanout_ledger", "fanout_state", SCRIPTS[args.script]):
+            sys.modules.pop(m, None)
+        mod = importlib.import_module(SCRIPTS[args.script])
+
+        print(f"{args.script}: {args.n} stories, latency {args.latency}s, error rate {args.error_rate}")
+        for i in range(args.runs):
+            r = run_once(mod, base)
+            rate = r["fetched"] / r["secs"] if r["secs"] else 0
+            print(f"  run {i + 1}: {r['fetched']} stories in {r['secs']:.2f}s = {rate:,.0f} stories/s | "
+                  f"{r['items']} items / {r['requests']} req / {r['bytes'] / 1e6:.1f} MB posted | "
+                  f"peak {r['peak'] / 1e6:.1f} MB | 413 {r['413']} 409 {r['409']} 500 {r['500']}")
+            if r["error"]:
+                print(f"    run failed: {r['error']!s:.200}")
+        stats = requests.get(base + "/_stats", timeout=5).json()
+        print("  stored:", json.dumps(stats["stored"]))
+    finally:
+        proc.terminate()
+        proc.wait()
+        for f in os.listdir(tmp):
+            os.remove(os.path.join(tmp, f))
+        os.rmdir(tmp)
+
+if __name__ == "__main__":
+    main()
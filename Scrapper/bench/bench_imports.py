@@ -0,0 +1,84 @@
+# bench/bench_imports.py
+# Import-time budget for the Scrapper entry points: imports each one in a fresh
+# interpreter under -X importtime and fails (exit 1) if it takes longer than its
+# budget or pulls in a heavy dependency that should only load on the code path
+# that needs it.
+#   python bench/bench_imports.py [--runs 5] [--scale 1.5] [--show 10]
+import os, sys, argparse, subprocess
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARSERS = ("bs4", "lxml", "readability", "trafilatura", "feedparser", "dateutil", "PyPDF2", "PIL", "numpy")
+
+# module -> (budget in ms, modules it must not import at load time)
+BUDGETS = {
+    "ingest_feeds_enhanced":          (150, PARSERS),
+    "rss_reader":                     (150, PARSERS),
+    "websub":                         (150, PARSERS),
+    "fanout_to_collections_enhanced": (150, ("numpy",)),
+    "projector_all_stories":          (150, ("numpy",)),
+    "spool":                          (30,  ("requests",)),
+}
+
+def import_profile(module: str) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, name) rows from -X importtime; name keeps its indent."""
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       cwd=HERE, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{p.stderr[-2000:]}")
+    rows = []
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cum_us), name.rstrip()))
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per module; the fastest counts")
+    ap.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1.0")),
+                    help="multiply every budget (slow CI machines)")
+    ap.add_argument("--show", type=int, default=0, help="print the N slowest imports of each module")
+    ap.add_argument("modules", nargs="*", help="default: every entry point in BUDGETS")
+    args = ap.parse_args()
+
+    failures = []
+    print(f"{'module':32} {'ms':>7} {'budget':>7}")
+    for module in args.modules or list(BUDGETS):
+        budget, forbidden = BUDGETS.get(module, (None, ()))
+        best = None
+        for _ in range(args.runs):
+            rows = import_profile(module)
+            total = next(cum for _, cum, name in rows if name.strip() == module)
+            if best is None or total < best[0]:
+                best = (total, rows)
+        total_ms, rows = best[0] / 1000, best[1]
+        limit = budget * args.scale if budget else None
+        print(f"{module:32} {total_ms:7.1f} {limit or float('nan'):7.0f}")
+
+        loaded = {name.strip() for _, _, name in rows}
+        heavy = sorted({m for m in forbidden for n in loaded if n == m or n.startswith(m + ".")})
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} at load time")
+        if limit and total_ms > limit:
+            failures.append(f"{module}: {total_ms:.0f}ms over its {limit:.0f}ms budget")
+        if args.show:
+            # the module's direct imports: rows are post-order, so they are the depth-1
+            # rows between the previous top-level row and the module's own row
+            end = next(i for i, (_, _, name) in enumerate(rows) if name.strip() == module)
+            start = max((i for i in range(end) if not rows[i][2].startswith("  ")), default=-1) + 1
+            direct = [(cum, name) for _, cum, name in rows[start:end]
+                      if name.startswith("   ") and not name.startswith("    ")]
+            for cum, name in sorted(direct, reverse=True)[:args.show]:
+                print(f"    {cum / 1000:7.1f}  {name.strip()}")
+
+    if failures:
+        print("\nFAIL")
+        for f in failures:
+            print("  " + f)
+        raise SystemExit(1)
+    print("\nOK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/bench_keywords.py
+# Stories/s of keyword_engine.extract_batch against the per-story cheap_keywords(),
+# plus how often each picks corpus-wide filler words as tags. "tag_stories" is
+# the ingest's path: post_batch tags the story dicts of each batch in one pass.
+#   python bench/bench_keywords.py [--n 5000] [--batch 100] [--paras 8]
+import os, sys, time, random, argparse, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("KEYWORD_DF_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_kw_"), "df.json"))
+import keyword_engine
+from article_text import ArticleText
+from ingest_feeds_enhanced import cheap_keywords, STOP
+
+# filler every story shares vs topic words that should win the tags
+FILLER = ("said year people time report week new first last told according percent officials "
+          "statement company season game team city country world").split()
+TOPICS = [("Lakers", "LeBron James", "playoffs", "rebounds"), ("Dune", "Denis Villeneuve", "sequel", "premiere"),
+          ("Arsenal", "Mikel Arteta", "midfielder", "transfer"), ("Netflix", "Stranger Things", "showrunner", "finale"),
+          ("Wimbledon", "Carlos Alcaraz", "tiebreak", "grass"), ("Oscars", "Emma Stone", "nominee", "ballot")]
+
+def synth_articles(n: int, paras: int, seed: int = 3) -> list[ArticleText]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        topic = rnd.choice(TOPICS)
+        ps = []
+        for _ in range(paras):
+            words = rnd.choices(FILLER, k=rnd.randint(30, 60)) + rnd.choices(topic, k=rnd.randint(1, 3))
+            rnd.shuffle(words)
+            ps.append(" ".join(words).capitalize() + ".")
+        out.append(ArticleText(ps))
+    return out
+
+def filler_rate(tag_lists: list[list[str]]) -> float:
+    tags = [t for ts in tag_lists for t in ts[:5]]
+    return sum(1 for t in tags if t in FILLER) / max(len(tags), 1)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=100)
+    ap.add_argument("--paras", type=int, default=8)
+    args = ap.parse_args()
+
+    arts = synth_articles(args.n, args.paras)
+    for a in arts:
+        a.lower                             # both paths read the cached buffer
+
+    t0 = time.perf_counter()
+    cheap = [cheap_keywords(a, topn=10) for a in arts]
+    t_cheap = time.perf_counter() - t0
+
+    # warm the corpus once so IDF has something to work with, then time a second pass
+    for i in range(0, args.n, args.batch):
+        keyword_engine.extract_batch(arts[i:i + args.batch], STOP)
+    t0 = time.perf_counter()
+    tfidf = []
+    for i in range(0, args.n, args.batch):
+        tfidf += keyword_engine.extract_batch(arts[i:i + args.batch], STOP)
+    t_batch = time.perf_counter() - t0
+
+    stories = [{"content": a.paras, "tags": []} for a in arts]
+    t0 = time.perf_counter()
+    for i in range(0, args.n, args.batch):
+        keyword_engine.tag_stories(stories[i:i + args.batch], STOP)
+    t_stories = time.perf_counter() - t0
+
+    print(f"{args.n} stories x {args.paras} paragraphs, batch {args.batch}")
+    print(f"  cheap_keywords()   {args.n / t_cheap:10,.0f} stories/s   filler in top-5 tags: {filler_rate(cheap):.0%}")
+    print(f"  extract_batch()    {args.n / t_batch:10,.0f} stories/s   filler in top-5 tags: {filler_rate(tfidf):.0%}"
+          f"   ({t_cheap / t_batch:.2f}x)")
+    print(f"  tag_stories()      {args.n / t_stories:10,.0f} stories/s   filler in top-5 tags: "
+          f"{filler_rate([s['tags'] for s in stories]):.0%}   ({t_cheap / t_stories:.2f}x)")
+    print(f"  sample: {cheap[0][:5]} -> {tfidf[0][:5]}")
+
+if __name__ == "__main__":
+    main()
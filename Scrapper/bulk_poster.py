@@ -0,0 +1,194 @@
+# bulk_poster.py
+# Feeds the movies/blogs/sports bulk endpoints concurrently over one pooled session.
+# Chunks are cut by serialized bytes (BODY_LIMIT) and the target chunk size adapts
+# to observed latency; each endpoint keeps at most MAX_INFLIGHT requests in flight.
+import os, time, json, queue, hashlib, threading
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+import fanout_ledger
+
+BODY_LIMIT     = int(os.getenv("BODY_LIMIT", str(4 * 1024 * 1024)))   # hard cap per request body
+START_BYTES    = int(os.getenv("START_BYTES", str(256 * 1024)))       # initial chunk target
+DELTA          = os.getenv("FULL_RESEND", "0") != "1"                 # skip items the ledger has already
+MIN_CHUNK_BYTES = int(os.getenv("MIN_CHUNK_BYTES", str(16 * 1024)))
+MAX_INFLIGHT   = int(os.getenv("MAX_INFLIGHT", "2"))                  # per endpoint
+TARGET_LATENCY = float(os.getenv("TARGET_LATENCY", "2.0"))           # seconds per request
+
+OK_STATUS = (200, 201, 207, 409)
+
+def encode_item(item) -> bytes:
+    return json.dumps(item, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+class ChunkBody:
+    """
+    {"items":[...]} over the already-encoded items, streamed piece by piece.
+    len() gives requests a Content-Length, so nothing is joined into one big
+    bytes object; iterating again (retries) replays the same bytes.
+    """
+
+    def __init__(self, parts: list[tuple]):
+        self.parts = parts
+        self.size = 12 + sum(len(p[0]) for p in parts) + max(len(parts) - 1, 0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        yield b'{"items":['
+        for i, p in enumerate(self.parts):
+            yield b"," + p[0] if i else p[0]
+        yield b"]}"
+
+def with_key(blob: bytes, digest: str) -> bytes:
+    """
+    The encoded item with its content hash as "idempotency_key". The key belongs to
+    the item, not the chunk, so it survives re-chunking and 413 splits: the bulk
+    endpoints skip an item whose stored key matches, however the retry was cut.
+    """
+    head = b'{"idempotency_key":"' + digest.encode("ascii") + b'"'
+    return head + (b"," + blob[1:] if blob != b"{}" else b"}")
+
+class EndpointPoster:
+    """One endpoint: byte-sized chunking, adaptive target, bounded worker pool."""
+
+    def __init__(self, session: requests.Session, url: str, label: str, ua: str, timeout: int, max_items: int):
+        self.session, self.url, self.label = session, url, label
+        self.ua, self.timeout, self.max_items = ua, timeout, max_items
+        self.target = min(START_BYTES, BODY_LIMIT)
+        self.parts: list[tuple] = []          # (encoded item with its key, reference_id, item hash)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {"items": 0, "bytes": 0, "requests": 0, "retries": 0, "splits": 0, "failed": 0,
+                      "new": 0, "changed": 0, "unchanged": 0}
+        self.q: queue.Queue = queue.Queue(maxsize=MAX_INFLIGHT)   # backpressure on the producer
+        self.workers = [threading.Thread(target=self._run, daemon=True) for _ in range(MAX_INFLIGHT)]
+        for w in self.workers:
+            w.start()
+
+    def add(self, item) -> None:
+        blob = encode_item(item)
+        ref = str(item.get("reference_id") or "")
+        digest = hashlib.sha256(blob).hexdigest()
+        if ref:
+            prev = fanout_ledger.get(self.url, ref)
+            if prev == digest and DELTA:
+                self.stats["unchanged"] += 1
+                return
+            self.stats["new" if prev is None else "changed"] += 1
+        with self.lock:
+            target = self.target
+        if self.parts and (self.size + len(blob) + 16 > target or len(self.parts) >= self.max_items):
+            self._cut()
+        blob = with_key(blob, digest)
+        self.parts.append((blob, ref, digest))
+        self.size += len(blob) + 1
+
+    def _cut(self) -> None:
+        if self.parts:
+            self.q.put(self.parts)
+            self.parts, self.size = [], 0
+
+    def _run(self) -> None:
+        while True:
+            parts = self.q.get()
+            if parts is None:
+                return
+            try:
+                self._send(parts)
+            except Exception as e:
+                print(f"{self.url}: POST error {e!r}")
+                with self.lock:
+                    self.stats["failed"] += len(parts)
+
+    def _post(self, body: ChunkBody) -> tuple[requests.Response, float]:
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": self.ua,
+        }
+        t0 = time.monotonic()
+        resp = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+        return resp, time.monotonic() - t0
+
+    def _adapt(self, elapsed: float) -> None:
+        with self.lock:
+            if elapsed < TARGET_LATENCY / 2:
+                self.target = min(BODY_LIMIT, int(self.target * 1.5))
+            elif elapsed > TARGET_LATENCY:
+                self.target = max(MIN_CHUNK_BYTES, int(self.target * 0.66))
+
+    def _split(self, parts: list[tuple]) -> None:
+        with self.lock:
+            self.stats["splits"] += 1
+        mid = len(parts) // 2
+        self._send(parts[:mid])
+        self._send(parts[mid:])
+
+    def _send(self, parts: list[tuple]) -> None:
+        body = ChunkBody(parts)
+        if len(body) > BODY_LIMIT and len(parts) > 1:
+            return self._split(parts)
+
+        resp, elapsed = self._post(body)
+        with self.lock:
+            self.stats["requests"] += 1
+        if resp.status_code == 413 and len(parts) > 1:
+            with self.lock:
+                self.target = max(MIN_CHUNK_BYTES, min(self.target, len(body)) // 2)
+            return self._split(parts)
+        if resp.status_code not in OK_STATUS and resp.status_code >= 400:
+            print(f"{self.url}: error {resp.status_code} {resp.text[:300]}")
+            time.sleep(1)
+            resp, elapsed = self._post(body)
+            with self.lock:
+                self.stats["requests"] += 1
+                self.stats["retries"] += 1
+            if resp.status_code not in OK_STATUS and resp.status_code >= 400:
+                print(f"{self.url}: giving up on {len(parts)} items ({resp.status_code})")
+                with self.lock:
+                    self.stats["failed"] += len(parts)
+                return
+
+        self._adapt(elapsed)
+        fanout_ledger.commit(self.url, [(ref, h) for _, ref, h in parts if ref])
+        with self.lock:
+            self.stats["items"] += len(parts)
+            self.stats["bytes"] += len(body)
+        print(f"{self.url}: sent {len(parts)} ({len(body)} B, {elapsed:.2f}s) -> {resp.status_code}")
+
+    def close(self) -> dict:
+        self._cut()
+        for _ in self.workers:
+            self.q.put(None)
+        for w in self.workers:
+            w.join()
+        return dict(self.stats)
+
+class BulkPoster:
+    """
+    poster = BulkPoster(api_base, {"movies": MOVIES_BULK, ...}, ua, timeout, max_items)
+    poster.add("movies", item) ...; stats = poster.close()  # raises if anything failed
+    """
+
+    def __init__(self, api_base: str, endpoints: dict[str, str], ua: str, timeout: int, max_items: int):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(endpoints), pool_maxsize=max(1, MAX_INFLIGHT) * len(endpoints))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.posters = {
+            label: EndpointPoster(self.session, urljoin(api_base, ep), label, ua, timeout, max_items)
+            for label, ep in endpoints.items()
+        }
+
+    def add(self, label: str, item) -> None:
+        self.posters[label].add(item)
+
+    def close(self) -> dict[str, dict]:
+        for p in self.posters.values():
+            p._cut()                       # queue every tail chunk before joining any endpoint
+        stats = {label: p.close() for label, p in self.posters.items()}
+        self.session.close()
+        failed = sum(s["failed"] for s in stats.values())
+        if failed:
+            raise RuntimeError(f"bulk post failed for {failed} items: {stats}")
+        return stats
@@ -0,0 +1,75 @@
+# charsets.py
+# Page encoding without statistical detection in the common case: BOM, then the
+# Content-Type charset, then <meta charset> / http-equiv in the first KB, then a
+# strict UTF-8 check; charset_normalizer only as a last resort, on a capped sample.
+# Callers keep the raw bytes and hand them to lxml/BeautifulSoup with the encoding.
+import re, codecs
+
+PRESCAN_BYTES = 1024
+DETECT_SAMPLE = 32 * 1024
+FALLBACK      = "windows-1252"          # what browsers assume for undeclared legacy pages
+
+BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+META_CHARSET_RE   = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+def _known(name: str | None) -> str | None:
+    if not name:
+        return None
+    try:
+        enc = codecs.lookup(name.strip().strip("\"'")).name
+    except LookupError:
+        return None
+    # a declared UTF-16 in a byte-oriented document is a lie (HTML spec): treat as UTF-8
+    if enc.startswith("utf-16"):
+        return "utf-8"
+    # browsers decode latin-1/ascii labels as windows-1252
+    if enc in ("latin-1", "iso8859-1", "ascii"):
+        return "cp1252"
+    return enc
+
+def declared_encoding(body: bytes, content_type: str | None = None) -> str | None:
+    """Encoding from BOM, header or <meta> prescan; None if the page does not say."""
+    for bom, enc in BOMS:
+        if body.startswith(bom):
+            return enc
+    m = HEADER_CHARSET_RE.search(content_type or "")
+    enc = _known(m.group(1)) if m else None
+    if enc:
+        return enc
+    m = META_CHARSET_RE.search(body[:PRESCAN_BYTES])
+    return _known(m.group(1).decode("ascii", "ignore")) if m else None
+
+def resolve_encoding(body: bytes, content_type: str | None = None) -> str:
+    enc = declared_encoding(body, content_type)
+    if enc:
+        return enc
+    try:
+        body.decode("utf-8")                 # strict; runs in C and is right for most undeclared pages
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(body[:DETECT_SAMPLE]).best()
+        if best and _known(best.encoding):
+            return _known(best.encoding)
+    except Exception:
+        pass
+    return FALLBACK
+
+def decode(body: bytes, encoding: str) -> str:
+    if encoding == "utf-8" and body.startswith(codecs.BOM_UTF8):
+        body = body[len(codecs.BOM_UTF8):]
+    return body.decode(encoding, "replace")
+
+def response_body(r) -> tuple[bytes, str]:
+    """(raw bytes, encoding) for a requests.Response, replacing r.text's detection."""
+    body = r.content
+    return body, resolve_encoding(body, r.headers.get("Content-Type"))
+
+def html_tree(body: bytes, encoding: str):
+    """lxml tree straight from the bytes (no str round trip)."""
+    import lxml.html
+    parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+    return lxml.html.document_fromstring(body, parser=parser)
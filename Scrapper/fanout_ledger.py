@@ -0,0 +1,46 @@
+# fanout_ledger.py
+# Local record of what each target collection already has: (collection, reference_id)
+# -> content hash of the last projection that was posted successfully.
+import os, time, sqlite3, threading
+
+LEDGER_PATH = os.getenv("FANOUT_LEDGER", ".cache/fanout_ledger.sqlite3")
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(LEDGER_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        _conn = sqlite3.connect(LEDGER_PATH, check_same_thread=False, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS sent (
+                collection TEXT NOT NULL, reference_id TEXT NOT NULL,
+                hash TEXT NOT NULL, sent_at REAL NOT NULL,
+                PRIMARY KEY (collection, reference_id)
+            )""")
+    return _conn
+
+def get(collection: str, reference_id: str) -> str | None:
+    with _lock:
+        row = _db().execute(
+            "SELECT hash FROM sent WHERE collection = ? AND reference_id = ?", (collection, reference_id)
+        ).fetchone()
+    return row[0] if row else None
+
+def commit(collection: str, entries: list[tuple[str, str]]) -> None:
+    """Record [(reference_id, hash)] as delivered to collection."""
+    if not entries:
+        return
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT OR REPLACE INTO sent (collection, reference_id, hash, sent_at) VALUES (?, ?, ?, ?)",
+            [(collection, ref, h, now) for ref, h in entries],
+        )
+        db.execute("COMMIT")
@@ -0,0 +1,46 @@
+# fanout_state.py
+# Watermark persistence for incremental fanout runs: the (updatedAt, _id) cursor
+# of the last story that was projected and posted successfully. updatedAt moves on
+# insert and on later changes such as image patches, so those are projected again.
+import os, json
+
+STATE_PATH = os.getenv("FANOUT_STATE", ".cache/fanout_state.json")
+
+def _read() -> dict:
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def load_cursor(name: str) -> str | None:
+    return (_read().get(name) or {}).get("cursor")
+
+def save_cursor(name: str, cursor: str) -> None:
+    state = _read()
+    state[name] = {"cursor": cursor}
+    d = os.path.dirname(STATE_PATH)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+def story_cursor(s: dict) -> str | None:
+    """'<updatedAt ISO>|<_id>' for a story as returned by /api/stories."""
+    at = s.get("updatedAt") or s.get("createdAt")
+    if not at or not s.get("_id"):
+        return None
+    return f"{at}|{s['_id']}"
+
+def after(cursor: str | None, s: dict) -> bool:
+    """True if story s sorts after cursor (updatedAt, then _id)."""
+    if not cursor:
+        return True
+    c = story_cursor(s)
+    if c is None:
+        return True
+    ts, _, oid = cursor.partition("|")
+    sts, _, sid = c.partition("|")
+    return (sts, sid) > (ts, oid)
@@ -0,0 +1,90 @@
+# feed_yield.py
+# Per-feed record of accepted stories per second of fetch + extraction time,
+# persisted across runs. schedule() orders a run's feeds by that yield, weighted
+# by category quota, with every category's best feed up front so each one gets
+# coverage even when the deadline cuts the run short.
+import os, json, threading
+
+YIELD_PATH  = os.getenv("FEED_YIELD_PATH", ".cache/feed_yield.json")
+DECAY       = 0.8                                         # older runs fade out
+PRIOR_SECS  = 5.0                                         # smoothing: this many seconds at the prior rate
+
+def _quotas() -> dict[str, float]:
+    # FEED_QUOTAS="sports=2,movies=1,blogs=1": relative weight of each category
+    out = {}
+    for part in os.getenv("FEED_QUOTAS", "").split(","):
+        k, _, v = part.partition("=")
+        try:
+            out[k.strip()] = float(v)
+        except ValueError:
+            pass
+    return out
+
+QUOTAS = _quotas()
+
+_lock = threading.Lock()
+_stats: dict[str, dict] | None = None
+_dirty = False
+
+def _load() -> dict:
+    global _stats
+    if _stats is None:
+        try:
+            with open(YIELD_PATH, encoding="utf-8") as f:
+                _stats = json.load(f)
+        except Exception:
+            _stats = {}
+    return _stats
+
+def _score(rec: dict | None, prior: float) -> float:
+    """Smoothed accepted stories per second; unseen feeds get `prior`."""
+    if not rec:
+        return prior
+    return (rec["accepted"] + prior * PRIOR_SECS) / (rec["secs"] + PRIOR_SECS)
+
+def record(url: str, accepted: int, seconds: float) -> None:
+    global _dirty
+    with _lock:
+        rec = _load().setdefault(url, {"runs": 0.0, "accepted": 0.0, "secs": 0.0})
+        rec["runs"]     = rec["runs"] * DECAY + 1
+        rec["accepted"] = rec["accepted"] * DECAY + accepted
+        rec["secs"]     = rec["secs"] * DECAY + seconds
+        _dirty = True
+
+def schedule(feeds: list[tuple[str, str]], quotas: dict[str, float] | None = None) -> list[tuple[str, str]]:
+    """
+    (url, category) pairs in processing order: first the best feed of each category
+    (categories by weighted score), then everything else by score * quota weight.
+    Feeds without history score as the median known feed, so they still get tried;
+    ties keep the input (PDF) order.
+    """
+    quotas = QUOTAS if quotas is None else quotas
+    with _lock:
+        stats = _load()
+        known = sorted(_score(stats[u], 0.0) for u, _ in feeds if u in stats)
+        prior = known[len(known) // 2] if known else 1.0 / PRIOR_SECS
+        keyed = [(_score(stats.get(u), prior) * quotas.get(cat, 1.0), i, u, cat)
+                 for i, (u, cat) in enumerate(feeds)]
+    keyed.sort(key=lambda k: (-k[0], k[1]))
+    first, rest, seen = [], [], set()
+    for k in keyed:
+        if k[3] not in seen:
+            seen.add(k[3])
+            first.append(k)
+        else:
+            rest.append(k)
+    return [(u, cat) for _, _, u, cat in first + rest]
+
+def save() -> None:
+    global _dirty
+    with _lock:
+        if not _dirty or _stats is None:
+            return
+        d = os.path.dirname(YIELD_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = YIELD_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_stats, f, separators=(",", ":"))
+        os.replace(tmp, YIELD_PATH)
+        _dirty = False
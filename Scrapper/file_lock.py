@@ -0,0 +1,54 @@
+# file_lock.py
+# Cross-process exclusive locks for the state files several scripts share (the cron
+# ingest, websub.py, the spool drainer): fcntl.flock on POSIX, msvcrt.locking on
+# Windows. Advisory: they only exclude processes that take the same lock.
+import os, time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:                        # Windows
+    fcntl = None
+    import msvcrt
+
+def try_lock(f) -> bool:
+    """Non-blocking exclusive lock on an open file; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def lock(f, poll: float = 0.05) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while not try_lock(f):                 # msvcrt's blocking mode gives up after ~10s
+        time.sleep(poll)
+
+def unlock(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def locked(path: str):
+    """
+    with locked(STATE_PATH + ".lock"): read, merge, write
+    Holds an exclusive lock on `path` (created if missing) for the block.
+    """
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(path, "a+b") as f:
+        lock(f)
+        try:
+            yield
+        finally:
+            unlock(f)
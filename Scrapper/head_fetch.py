@@ -0,0 +1,125 @@
+# head_fetch.py
+# Streaming <head>-only page fetch: parses the response incrementally with lxml and
+# closes the connection at </head> (or <body>, or HEAD_MAX_BYTES), returning the
+# meta tags, <link> rels and JSON-LD blocks that image/metadata lookups need.
+# HeadStream keeps the response open so a head miss can read on to the full page.
+import os
+import requests
+from lxml import etree
+import charsets
+
+HEAD_MAX_BYTES = int(os.getenv("HEAD_MAX_BYTES", str(256 * 1024)))
+HEAD_CHUNK     = 8 * 1024
+
+def _attrs_lower(el) -> dict:
+    return {str(k).lower(): (v or "") for k, v in el.attrib.items()}
+
+def parse_head(chunks, max_bytes: int = HEAD_MAX_BYTES) -> dict:
+    """
+    Feed byte chunks until the head is complete. Returns
+    {"meta": {name/property: content}, "links": {rel: href}, "jsonld": [raw text],
+     "title": str|None, "bytes": n read, "complete": saw the end of <head>}.
+    The first occurrence of each meta name / link rel wins.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    out = {"meta": {}, "links": {}, "jsonld": [], "title": None, "bytes": 0, "complete": False}
+    for chunk in chunks:
+        if not chunk:
+            continue
+        out["bytes"] += len(chunk)
+        parser.feed(chunk)
+        for event, el in parser.read_events():
+            tag = el.tag if isinstance(el.tag, str) else ""
+            tag = tag.lower()
+            if (event == "start" and tag == "body") or (event == "end" and tag == "head"):
+                out["complete"] = True
+                break
+            if event != "end":
+                continue
+            if tag == "meta":
+                a = _attrs_lower(el)
+                key = (a.get("property") or a.get("name") or a.get("itemprop") or "").strip().lower()
+                if key and a.get("content") and key not in out["meta"]:
+                    out["meta"][key] = a["content"].strip()
+            elif tag == "link":
+                a = _attrs_lower(el)
+                for rel in a.get("rel", "").lower().split():
+                    if a.get("href") and rel not in out["links"]:
+                        out["links"][rel] = a["href"].strip()
+            elif tag == "script":
+                if (el.get("type") or "").strip().lower() == "application/ld+json" and el.text:
+                    out["jsonld"].append(el.text)
+            elif tag == "title" and out["title"] is None:
+                out["title"] = (el.text or "").strip() or None
+        if out["complete"] or out["bytes"] >= max_bytes:
+            break
+    return out
+
+class HeadStream:
+    """
+    A page GET paused after its <head>: .head is parse_head's result (None when the
+    page failed or isn't HTML) and rest() reads the remainder of the same response,
+    so falling back to the full page costs no second request. .failed is True when
+    the page could not be read (network error, 408/429/5xx) rather than being
+    missing or not HTML. Closes on exit:
+        with HeadStream(url, ua) as hs: ...
+    """
+
+    def __init__(self, url: str, ua: str, timeout: int = 10, max_bytes: int = HEAD_MAX_BYTES):
+        self.head = None
+        self.r = None
+        self.failed = False
+        self._chunks: list[bytes] = []
+        try:
+            self.r = requests.get(url, headers={"User-Agent": ua, "Accept": "text/html,*/*;q=0.8"},
+                                  timeout=timeout, stream=True)
+        except Exception:
+            self.failed = True
+            return
+        try:
+            if self.r.status_code >= 400:
+                self.failed = self.r.status_code in (408, 429) or self.r.status_code >= 500
+                return
+            ct = (self.r.headers.get("Content-Type") or "").lower()
+            if ct and "html" not in ct and "xml" not in ct:
+                return
+            self._it = self.r.iter_content(HEAD_CHUNK)
+            head = parse_head(self._tee(), max_bytes)
+            head["url"] = self.r.url         # after redirects, the base for relative URLs
+            self.head = head
+        except Exception:
+            self.head = None
+            self.failed = True
+
+    def _tee(self):
+        for chunk in self._it:
+            self._chunks.append(chunk)
+            yield chunk
+
+    def rest(self) -> tuple[bytes, str] | None:
+        """(whole body, encoding): the bytes parse_head saw plus the rest of the stream."""
+        if self.head is None:
+            return None
+        try:
+            for _ in self._tee():
+                pass
+        except Exception:
+            self.failed = True
+            return None
+        body = b"".join(self._chunks)
+        return body, charsets.resolve_encoding(body, self.r.headers.get("Content-Type"))
+
+    def close(self) -> None:
+        if self.r is not None:
+            self.r.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def fetch_head(url: str, ua: str, timeout: int = 10, max_bytes: int = HEAD_MAX_BYTES) -> dict | None:
+    """parse_head over a streamed GET; the connection is dropped as soon as the head is read."""
+    with HeadStream(url, ua, timeout, max_bytes) as hs:
+        return hs.head
@@ -0,0 +1,106 @@
+# image_cache.py
+# Persistent image-validation cache shared across stories and runs (sqlite, stdlib only).
+import os, time, sqlite3, threading
+
+CACHE_PATH = os.getenv("IMG_CACHE_PATH", ".cache/image_cache.sqlite3")
+TTL_OK     = int(os.getenv("IMG_CACHE_TTL", str(7 * 86400)))        # valid images
+TTL_BAD    = int(os.getenv("IMG_CACHE_NEG_TTL", str(86400)))        # rejected images
+MAX_ROWS   = int(os.getenv("IMG_CACHE_MAX", "50000"))
+EVICT_EVERY = 500                                                    # puts between size checks
+
+def transient(status: int | None) -> bool:
+    """Rate limits and server errors say nothing about the image: retry next time."""
+    return status is not None and (status in (408, 429) or status >= 500)
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_stats = {"hits": 0, "neg_hits": 0, "misses": 0, "expired": 0, "puts": 0, "evicted": 0}
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(CACHE_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                ct TEXT, length INTEGER, width INTEGER, height INTEGER,
+                ok INTEGER NOT NULL, checked_at REAL NOT NULL
+            )""")
+        _conn.execute("CREATE INDEX IF NOT EXISTS images_checked ON images(checked_at)")
+    return _conn
+
+def get(url: str) -> dict | None:
+    """Cached {ct, length, dims, ok, checked_at} for url, or None on miss/expiry."""
+    with _lock:
+        try:
+            row = _db().execute(
+                "SELECT ct, length, width, height, ok, checked_at FROM images WHERE url = ?", (url,)
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if not row:
+            _stats["misses"] += 1
+            return None
+        ct, length, w, h, ok, checked_at = row
+        if time.time() - checked_at > (TTL_OK if ok else TTL_BAD):
+            _stats["expired"] += 1
+            return None
+        _stats["hits" if ok else "neg_hits"] += 1
+    return {
+        "ct": ct, "length": length,
+        "dims": (w, h) if w and h else None,
+        "ok": bool(ok), "checked_at": checked_at,
+    }
+
+def put(url: str, info: dict, ok: bool) -> None:
+    if not ok and transient(info.get("status")):
+        return
+    dims = info.get("dims") or (None, None)
+    with _lock:
+        try:
+            db = _db()
+            db.execute(
+                "INSERT OR REPLACE INTO images (url, ct, length, width, height, ok, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, info.get("ct"), info.get("length"), dims[0], dims[1], int(ok), time.time()),
+            )
+            _stats["puts"] += 1
+            if _stats["puts"] % EVICT_EVERY == 0:
+                _evict(db)
+        except sqlite3.Error:
+            pass
+
+def _evict(db: sqlite3.Connection) -> None:
+    now = time.time()
+    cur = db.execute(
+        "DELETE FROM images WHERE (ok = 1 AND checked_at < ?) OR (ok = 0 AND checked_at < ?)",
+        (now - TTL_OK, now - TTL_BAD),
+    )
+    n = cur.rowcount or 0
+    (total,) = db.execute("SELECT COUNT(*) FROM images").fetchone()
+    if total > MAX_ROWS:
+        cur = db.execute(
+            "DELETE FROM images WHERE url IN (SELECT url FROM images ORDER BY checked_at LIMIT ?)",
+            (total - MAX_ROWS,),
+        )
+        n += cur.rowcount or 0
+    _stats["evicted"] += n
+
+def stats() -> dict:
+    with _lock:
+        s = dict(_stats)
+    lookups = s["hits"] + s["neg_hits"] + s["misses"] + s["expired"]
+    s["lookups"] = lookups
+    s["hit_rate"] = round((s["hits"] + s["neg_hits"]) / lookups, 3) if lookups else 0.0
+    return s
+
+def report() -> None:
+    s = stats()
+    if s["lookups"]:
+        print(f"Image cache: {s['lookups']} lookups, hit rate {s['hit_rate']:.1%} "
+              f"({s['hits']} ok, {s['neg_hits']} negative, {s['misses']} miss, {s['expired']} expired), "
+              f"{s['puts']} stored, {s['evicted']} evicted")
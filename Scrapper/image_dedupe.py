@@ -0,0 +1,161 @@
+# image_dedupe.py
+# Collapse the same photo served at different sizes / CDN params into one (largest) URL.
+import re, requests
+from io import BytesIO
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+PHASH_DISTANCE = 6                    # max differing dHash bits for "same picture"
+PIXEL_TIMEOUT  = 10
+PIXEL_MAX_BYTES = 5_000_000
+
+# query params that only select a rendition of the same image
+SIZE_PARAMS = {
+    "w","h","width","height","resize","fit","crop","quality","q","dpr","auto","fm","format",
+    "size","strip","zoom","im","impolicy","imwidth","imheight","s","sz","mw","mh","maxwidth",
+    "maxheight","ssl","rect","precrop","ar","fit-in","smart",
+}
+WP_SIZE_RE   = re.compile(r"-(\d{2,5})x(\d{2,5})(?=\.\w{3,4}$)")        # photo-1024x576.jpg
+DIM_SEG_RE   = re.compile(r"^(\d{2,5})x(\d{2,5})$")                     # /1200x675/photo.jpg
+CLD_TOKEN_RE = re.compile(r"^[a-z]{1,3}_[\w.:-]+$")                      # cloudinary w_800,c_fill
+CLD_W_RE     = re.compile(r"(?:^|,)w_(\d+)")
+CLD_H_RE     = re.compile(r"(?:^|,)h_(\d+)")
+
+def _int(v) -> int:
+    try:
+        return int(float(v))
+    except Exception:
+        return 0
+
+def canonical_image_key(url: str) -> tuple[str, int]:
+    """
+    (key, size_hint): key is the URL with rendition/size selectors removed,
+    size_hint is the best guess of the rendition's pixel size (URLs without any
+    size selector are assumed to be the original and rank highest).
+    """
+    try:
+        u = urlparse(url)
+    except Exception:
+        return url, 0
+    w = h = 0
+    query = []
+    for k, v in parse_qsl(u.query, keep_blank_values=True):
+        lk = k.lower()
+        if lk in ("w","width","imwidth","mw","maxwidth"):
+            w = max(w, _int(v))
+        elif lk in ("h","height","imheight","mh","maxheight"):
+            h = max(h, _int(v))
+        elif lk == "resize" and "," in v:
+            a, _, b = v.partition(",")
+            w, h = max(w, _int(a)), max(h, _int(b))
+        if lk not in SIZE_PARAMS:
+            query.append((k, v))
+
+    segs = []
+    for seg in u.path.split("/"):
+        m = DIM_SEG_RE.match(seg)
+        if m:
+            w, h = max(w, int(m.group(1))), max(h, int(m.group(2)))
+            continue
+        toks = seg.split(",")
+        if seg and all(CLD_TOKEN_RE.match(t) for t in toks) and any(t[:2] in ("w_","h_","c_","q_","f_") for t in toks):
+            mw, mh = CLD_W_RE.search(seg), CLD_H_RE.search(seg)
+            w = max(w, int(mw.group(1)) if mw else 0)
+            h = max(h, int(mh.group(1)) if mh else 0)
+            continue
+        segs.append(seg)
+    path = "/".join(segs)
+    m = WP_SIZE_RE.search(path)
+    if m:
+        w, h = max(w, int(m.group(1))), max(h, int(m.group(2)))
+        path = path[:m.start()] + path[m.end():]
+    elif w == 0 and h == 0:
+        w = 1_000_000                     # no selector at all: likely the original
+
+    key = urlunparse(("", u.netloc.lower(), path, "", urlencode(query), ""))
+    return key, (w * h if w and h else w or h)
+
+def dhash(im) -> int:
+    """64-bit difference hash of a PIL image."""
+    from PIL import Image
+    g = im.convert("L").resize((9, 8), Image.BILINEAR)
+    px = list(g.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+def fetch_pixels(url: str, ua: str, timeout: float = PIXEL_TIMEOUT):
+    """(PIL image reduced for hashing, original (w,h)) or None."""
+    try:
+        from PIL import Image  # optional; pip install pillow
+        with requests.get(url, headers={"User-Agent": ua}, stream=True, timeout=timeout) as r:
+            r.raise_for_status()
+            data = r.raw.read(PIXEL_MAX_BYTES, decode_content=True)
+        im = Image.open(BytesIO(data))
+        size = im.size
+        im.draft("L", (64, 64))           # JPEG: decode at 1/8 scale
+        return im, size
+    except Exception:
+        return None
+
+def dedupe_images(urls: list[str], load=None) -> tuple[list[str], dict[str, str]]:
+    """
+    Returns (deduped urls in first-seen order, {original url: kept url}).
+    URLs are grouped by canonical_image_key keeping the largest rendition; if
+    `load(url) -> (PIL image, (w,h)) | None` is given, the survivors are also
+    compared by dHash and near-identical pictures merged into the largest one.
+    """
+    groups: dict[str, list[str]] = {}
+    best: dict[str, tuple[int, str]] = {}
+    for u in urls:
+        if not u:
+            continue
+        key, size = canonical_image_key(u)
+        groups.setdefault(key, []).append(u)
+        if key not in best or size > best[key][0]:
+            best[key] = (size, u)
+
+    keys = list(groups)
+    if load and len(keys) > 1:
+        info = {}                         # key -> (dhash, pixel area)
+        for key in keys:
+            got = load(best[key][1])
+            if got:
+                im, (w, h) = got
+                info[key] = (dhash(im), w * h)
+        heads, owner = [], {}
+        for key in keys:
+            if key not in info:
+                continue
+            for head in heads:
+                if bin(info[key][0] ^ info[head][0]).count("1") <= PHASH_DISTANCE:
+                    owner[key] = head
+                    break
+            else:
+                heads.append(key)
+        merged: dict[str, list[str]] = {}
+        for key in keys:
+            merged.setdefault(owner.get(key, key), []).append(key)
+        groups = {h: [u for k in ks for u in groups[k]] for h, ks in merged.items()}
+        best = {h: best[max(ks, key=lambda k: info[k][1] if k in info else -1)] for h, ks in merged.items()}
+        keys = list(merged)
+
+    out, mapping = [], {}
+    for key in keys:
+        kept = best[key][1]
+        out.append(kept)
+        for u in groups[key]:
+            mapping[u] = kept
+    return out, mapping
+
+def dedupe_content_images(cimgs: list[dict], mapping: dict[str, str]) -> list[dict]:
+    """Point contentImages at the kept rendition and drop repeats (first position wins)."""
+    seen, out = set(), []
+    for ci in cimgs:
+        url = mapping.get(ci.get("url"), ci.get("url"))
+        if url in seen:
+            continue
+        seen.add(url)
+        out.append({**ci, "url": url})
+    return out
@@ -0,0 +1,151 @@
+# image_derivatives.py
+# Optional post-extraction stage: download each chosen image once and store
+# fixed-width WebP variants + a tiny blur placeholder in a content-addressed dir.
+# Serving that dir is up to the deployment (CDN, nginx, a bucket sync); its public
+# base goes in IMG_DERIV_BASE_URL, which the stage requires.
+import os, json, time, base64, hashlib, requests
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+DERIV_DIR       = os.getenv("IMG_DERIV_DIR", ".cache/derivatives")
+DERIV_BASE_URL  = os.getenv("IMG_DERIV_BASE_URL", "")               # required: public URL DERIV_DIR is served at
+DERIV_WIDTHS    = tuple(int(w) for w in os.getenv("IMG_DERIV_WIDTHS", "320,640,1024").split(",") if w.strip())
+DERIV_WORKERS   = int(os.getenv("IMG_DERIV_WORKERS", "4"))
+DERIV_TIMEOUT   = int(os.getenv("IMG_DERIV_TIMEOUT", "20"))
+DERIV_FAIL_TTL  = int(os.getenv("IMG_DERIV_FAIL_TTL", str(86400)))   # undecodable images are retried after this
+DERIV_MAX_BYTES = 15_000_000
+WEBP_QUALITY    = 78
+BLUR_WIDTH      = 16
+
+UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+      "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+def _index_path(url: str) -> str:
+    # url -> manifest pointer, so repeat URLs skip the download entirely
+    return os.path.join(DERIV_DIR, "index", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+def _write_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _read_json(path: str) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _download(url: str) -> bytes | None:
+    try:
+        with requests.get(url, headers={"User-Agent": UA}, stream=True, timeout=DERIV_TIMEOUT) as r:
+            r.raise_for_status()
+            buf = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                buf += chunk
+                if len(buf) > DERIV_MAX_BYTES:
+                    return None
+            return bytes(buf)
+    except Exception:
+        return None
+
+def pillow_ok() -> bool:
+    try:
+        import PIL  # optional; pip install pillow
+        return True
+    except ImportError:
+        return False
+
+def _render(data: bytes, digest: str) -> dict | None:
+    try:
+        return _render_variants(data, digest)
+    except Exception as e:                    # undecodable image, disk full, encoder error
+        print(f"Derivatives: {digest[:12]} failed: {e!r}")
+        return None
+
+def _render_variants(data: bytes, digest: str) -> dict | None:
+    from PIL import Image, ImageOps
+    im = Image.open(BytesIO(data))
+    im = ImageOps.exif_transpose(im)
+    im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+
+    w, h = im.size
+    rel_dir = f"{digest[:2]}/{digest}"
+    out_dir = os.path.join(DERIV_DIR, digest[:2], digest)
+    os.makedirs(out_dir, exist_ok=True)
+
+    variants = {}
+    # never upscale: widths wider than the original collapse to the original width
+    for tw in sorted({min(tw, w) for tw in DERIV_WIDTHS}):
+        name = f"w{tw}.webp"
+        th = max(1, round(h * tw / w))
+        im.resize((tw, th), Image.LANCZOS).save(os.path.join(out_dir, name), "WEBP", quality=WEBP_QUALITY, method=4)
+        variants[str(tw)] = f"{DERIV_BASE_URL.rstrip('/')}/{rel_dir}/{name}"
+
+    bw = min(BLUR_WIDTH, w)
+    tiny = BytesIO()
+    im.resize((bw, max(1, round(h * bw / w))), Image.BILINEAR).save(tiny, "WEBP", quality=30)
+    blur = "data:image/webp;base64," + base64.b64encode(tiny.getvalue()).decode("ascii")
+
+    return {"hash": digest, "width": w, "height": h, "variants": variants, "blur": blur}
+
+def derive(url: str) -> dict | None:
+    """Manifest {hash,width,height,variants{width:url},blur} for one source image."""
+    idx = _index_path(url)
+    cached = _read_json(idx)
+    if cached and "failed_at" not in cached:
+        return cached
+    if cached and time.time() - cached["failed_at"] < DERIV_FAIL_TTL:
+        return None                           # failed recently; {} from older runs is retried
+
+    data = _download(url)
+    if not data:
+        return None                           # transient; retried next run
+    digest = hashlib.sha256(data).hexdigest()
+    mpath = os.path.join(DERIV_DIR, digest[:2], digest, "manifest.json")
+    manifest = _read_json(mpath)              # same bytes under another URL
+    if manifest is None:
+        manifest = _render(data, digest)
+        if manifest:
+            _write_json(mpath, manifest)
+    _write_json(idx, manifest or {"failed_at": time.time()})
+    return manifest
+
+def _derive_safe(url: str) -> dict | None:
+    try:
+        return derive(url)
+    except Exception as e:                    # e.g. an unwritable DERIV_DIR
+        print(f"Derivatives: {url} failed: {e!r}")
+        return None
+
+def story_image_urls(story: dict) -> list[str]:
+    urls = [story.get("thumbnail"), story.get("image")] + list(story.get("images") or [])
+    urls += [ci.get("url") for ci in (story.get("contentImages") or []) if isinstance(ci, dict)]
+    return list(dict.fromkeys(u for u in urls if isinstance(u, str) and u.startswith("http")))
+
+def attach_derivatives(stories: list[dict]) -> None:
+    """
+    Derive all images of a batch on a worker pool; sets story['imageVariants'] = {src_url: manifest}.
+    Never raises: stories without derivatives are posted as they are.
+    """
+    wanted = list(dict.fromkeys(u for s in stories for u in story_image_urls(s)))
+    if not wanted:
+        return
+    if not pillow_ok():
+        print("Derivatives: Pillow is not installed, skipped")
+        return
+    if not DERIV_BASE_URL:
+        # nothing in the stack serves DERIV_DIR; variant URLs would all 404
+        print("Derivatives: IMG_DERIV_BASE_URL is not set, skipped")
+        return
+    with ThreadPoolExecutor(max_workers=DERIV_WORKERS) as pool:
+        manifests = dict(zip(wanted, pool.map(_derive_safe, wanted)))
+    done = 0
+    for s in stories:
+        found = {u: manifests[u] for u in story_image_urls(s) if manifests.get(u)}
+        if found:
+            s["imageVariants"] = found
+            done += 1
+    print(f"Derivatives: {sum(1 for m in manifests.values() if m)}/{len(wanted)} images, {done} stories")
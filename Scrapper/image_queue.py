@@ -0,0 +1,215 @@
+# image_queue.py
+# Deferred image resolution: the reader posts each story with its best unvalidated
+# candidate (imageStatus "pending") and enqueues a job here; this worker probes the
+# candidates (or resolves from the page), then patches the stories' image fields in
+# bulk via PATCH /api/stories/bulk/images. Jobs live in sqlite so they survive the
+# reader's exit; failed attempts are retried with exponential backoff.
+#   python image_queue.py work            # loops; --once to exit when nothing is due
+#   python image_queue.py stats           # backlog
+import os, json, time, sqlite3, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUE_PATH    = os.getenv("IMAGE_QUEUE_PATH", ".cache/image_queue.sqlite3")
+PATCH_URL     = os.getenv("IMAGE_PATCH_URL", "http://localhost:5000/api/stories/bulk/images")
+WORKERS       = int(os.getenv("IMAGE_QUEUE_WORKERS", "8"))         # stories resolved concurrently
+BATCH         = int(os.getenv("IMAGE_QUEUE_BATCH", "100"))         # jobs claimed / patched per round
+MAX_ATTEMPTS  = int(os.getenv("IMAGE_QUEUE_ATTEMPTS", "6"))
+RETRY_BASE    = float(os.getenv("IMAGE_QUEUE_RETRY_BASE", "30"))   # seconds, doubled per attempt
+RETRY_MAX     = float(os.getenv("IMAGE_QUEUE_RETRY_MAX", "3600"))
+LEASE_SECS    = float(os.getenv("IMAGE_QUEUE_LEASE", "300"))       # a claimed job reappears after this
+KEEP_SECS     = float(os.getenv("IMAGE_QUEUE_KEEP", str(14 * 86400)))   # patched jobs kept so re-posts skip them
+POLL_SECS     = float(os.getenv("IMAGE_QUEUE_POLL", "5"))
+TIMEOUT       = int(os.getenv("REQUEST_TIMEOUT", "60"))
+
+# state: pending (resolve) -> resolved (patch) -> patched (deleted after KEEP_SECS);
+# failed after MAX_ATTEMPTS
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        d = os.path.dirname(QUEUE_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        _conn = sqlite3.connect(QUEUE_PATH, check_same_thread=False, isolation_level=None, timeout=30)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                fingerprint TEXT PRIMARY KEY,
+                story TEXT NOT NULL,             -- match keys: canonicalUrl / source+guid / fingerprint
+                link TEXT NOT NULL,
+                candidates TEXT NOT NULL,        -- JSON list, priority order
+                expect TEXT,                     -- the unvalidated image the story was posted with
+                state TEXT NOT NULL,
+                result TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_try REAL NOT NULL,
+                enqueued_at REAL NOT NULL,
+                error TEXT
+            )""")
+        _conn.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs(state, next_try)")
+    return _conn
+
+def enqueue(story: dict, candidates: list[str]) -> None:
+    """
+    Queue image resolution for a posted story. A re-post of a story whose job is
+    still open or already patched changes nothing (the API keeps the stored image);
+    only a failed job starts over.
+    """
+    keys = {k: story.get(k) for k in ("canonicalUrl", "source", "guid", "fingerprint") if story.get(k)}
+    now = time.time()
+    with _lock:
+        _db().execute(
+            "INSERT INTO jobs (fingerprint, story, link, candidates, expect, state, attempts, next_try, enqueued_at) "
+            "VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?) "
+            "ON CONFLICT(fingerprint) DO UPDATE SET story = excluded.story, link = excluded.link, "
+            "candidates = excluded.candidates, expect = excluded.expect, state = 'pending', attempts = 0, "
+            "next_try = excluded.next_try, enqueued_at = excluded.enqueued_at, error = NULL "
+            "WHERE jobs.state = 'failed'",
+            (story["fingerprint"], json.dumps(keys), story.get("link") or "", json.dumps(candidates),
+             story.get("image"), now, now))
+
+def _claim(state: str, limit: int) -> list[tuple]:
+    """Due jobs in `state`, leased for LEASE_SECS so a second worker skips them."""
+    now = time.time()
+    with _lock:
+        db = _db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT fingerprint, story, link, candidates, expect, result, attempts FROM jobs "
+                "WHERE state = ? AND next_try <= ? ORDER BY next_try LIMIT ?", (state, now, limit)).fetchall()
+            db.executemany("UPDATE jobs SET next_try = ? WHERE fingerprint = ?",
+                           [(now + LEASE_SECS, r[0]) for r in rows])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+    return rows
+
+def _retry(fp: str, attempts: int, error: str) -> None:
+    attempts += 1
+    with _lock:
+        if attempts >= MAX_ATTEMPTS:
+            _db().execute("UPDATE jobs SET state = 'failed', attempts = ?, error = ? WHERE fingerprint = ?",
+                          (attempts, error[:500], fp))
+        else:
+            delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+            _db().execute("UPDATE jobs SET attempts = ?, next_try = ?, error = ? WHERE fingerprint = ?",
+                          (attempts, time.time() + delay, error[:500], fp))
+
+def resolve(link: str, candidates: list[str]) -> str | None:
+    """
+    First acceptable candidate; with none collected, the same <head>-then-page
+    lookup rss_reader.clean_entry does inline (IMAGE_MODE=inline). Raises
+    image_resolver.ProbeFailed when the page or the candidates couldn't be checked
+    (site or CDN down, rate limited): the job is retried and the posted candidate
+    stays in place.
+    """
+    from image_resolver import first_acceptable
+    from rss_reader import UA, lookup_image
+    if candidates:
+        return first_acceptable(candidates, UA)
+    return lookup_image(link, strict=True)
+
+def _resolve_job(row) -> None:
+    fp, _, link, candidates, _, _, attempts = row
+    try:
+        image = resolve(link, json.loads(candidates))
+    except Exception as e:
+        _retry(fp, attempts, f"resolve: {e}")
+        return
+    with _lock:
+        _db().execute("UPDATE jobs SET state = 'resolved', result = ?, attempts = 0, next_try = 0 WHERE fingerprint = ?",
+                      (json.dumps(image), fp))
+
+def default_patch(items: list[dict]) -> bool:
+    import requests
+    try:
+        r = requests.patch(PATCH_URL, json={"items": items}, timeout=TIMEOUT)
+    except Exception as e:
+        print("image queue: PATCH error:", e)
+        return False
+    if r.status_code >= 400:
+        print(f"image queue: PATCH {r.status_code} {r.text[:300]}")
+        return False
+    return True
+
+def _patch_resolved(patch) -> int:
+    rows = _claim("resolved", BATCH)
+    if not rows:
+        return 0
+    items = []
+    for fp, story, _, _, expect, result, _ in rows:
+        image = json.loads(result)
+        items.append({**json.loads(story), "image": image, "imageStatus": "ok" if image else "none", "expect": expect})
+    if patch(items):
+        now = time.time()
+        with _lock:
+            _db().executemany("UPDATE jobs SET state = 'patched', next_try = ? WHERE fingerprint = ?",
+                              [(now, r[0]) for r in rows])
+        return len(rows)
+    for r in rows:
+        _retry(r[0], r[6], "patch failed")
+    return 0
+
+def work_once(patch=default_patch, pool: ThreadPoolExecutor | None = None) -> dict:
+    """Resolve every due pending job, then patch everything resolved. Returns counts."""
+    stats = {"resolved": 0, "patched": 0}
+    with _lock:                            # next_try of a patched job is when it was patched
+        _db().execute("DELETE FROM jobs WHERE state = 'patched' AND next_try < ?", (time.time() - KEEP_SECS,))
+    own = pool is None
+    pool = pool or ThreadPoolExecutor(max_workers=WORKERS)
+    try:
+        while True:
+            rows = _claim("pending", BATCH)
+            if not rows:
+                break
+            list(pool.map(_resolve_job, rows))
+            stats["resolved"] += len(rows)
+            stats["patched"] += _patch_resolved(patch)
+        while True:
+            n = _patch_resolved(patch)
+            if not n:
+                break
+            stats["patched"] += n
+    finally:
+        if own:
+            pool.shutdown(wait=True)
+    return stats
+
+def backlog() -> dict:
+    with _lock:
+        db = _db()
+        counts = dict(db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        (oldest,) = db.execute("SELECT MIN(enqueued_at) FROM jobs WHERE state IN ('pending', 'resolved')").fetchone()
+    return {
+        "pending": counts.get("pending", 0),
+        "resolved": counts.get("resolved", 0),     # waiting for the PATCH
+        "failed": counts.get("failed", 0),
+        "oldest_secs": round(time.time() - oldest) if oldest else 0,
+    }
+
+def work(once: bool = False, patch=default_patch) -> None:
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        while True:
+            st = work_once(patch, pool)
+            if st["resolved"] or st["patched"]:
+                print(f"image queue: resolved {st['resolved']}, patched {st['patched']}; backlog {backlog()}")
+            if once:
+                return
+            time.sleep(POLL_SECS)
+
+def main():
+    ap = argparse.ArgumentParser(description="deferred image resolution for posted stories")
+    ap.add_argument("cmd", choices=["work", "stats"])
+    ap.add_argument("--once", action="store_true", help="process what is due, then exit")
+    args = ap.parse_args()
+    if args.cmd == "stats":
+        print(json.dumps(backlog()))
+        return
+    work(args.once)
+
+if __name__ == "__main__":
+    main()
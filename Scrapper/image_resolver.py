@@ -1,12 +1,17 @@
 # image_resolver.py
-import json, requests
-from io import BytesIO
+import json, time, threading, requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
+import image_cache, singleflight
 
 IMG_TIMEOUT = 12
 MIN_BYTES = 15_000                    # ignore tiny icons
 ACCEPT_TYPES = {"image/jpeg","image/jpg","image/png","image/webp"}
+SNIFF_BYTES = 64_000                  # max header bytes read per candidate (big EXIF blocks)
+SNIFF_CHUNK = 4_096
+PROBE_WORKERS = 4                     # concurrent candidate probes per page
+RESOLVE_DEADLINE = 20                 # seconds for a whole resolve_best_image call
 
 def _abs(url: str, base: str) -> str:
     try:
@@ -20,29 +25,149 @@ def _is_image_content_type(ct: str | None) -> bool:
     ct = ct.split(";")[0].strip().lower()
     return (ct in ACCEPT_TYPES) or ct.startswith("image/")
 
-def _head_ok(url: str, ua: str) -> bool:
+def _be16(b: bytes, i: int) -> int:
+    return (b[i] << 8) | b[i+1]
+
+def _le16(b: bytes, i: int) -> int:
+    return b[i] | (b[i+1] << 8)
+
+def _le24(b: bytes, i: int) -> int:
+    return b[i] | (b[i+1] << 8) | (b[i+2] << 16)
+
+def _jpeg_dims(b: bytes) -> tuple[int,int] | None:
+    i = 2
+    while i + 4 <= len(b):
+        if b[i] != 0xFF:
+            return None
+        m = b[i+1]
+        if m == 0xFF:                      # fill byte
+            i += 1; continue
+        if m in (0xD8, 0x01) or 0xD0 <= m <= 0xD7:
+            i += 2; continue
+        seg = _be16(b, i+2)
+        # SOF0..SOF15 carry the frame size (C4/C8/CC are DHT/JPG/DAC)
+        if 0xC0 <= m <= 0xCF and m not in (0xC4, 0xC8, 0xCC):
+            if i + 9 > len(b):
+                return None
+            return _be16(b, i+7), _be16(b, i+5)
+        i += 2 + seg
+    return None
+
+def _webp_dims(b: bytes) -> tuple[int,int] | None:
+    if len(b) < 30:
+        return None
+    kind = b[12:16]
+    if kind == b"VP8 " and b[23:26] == b"\x9d\x01\x2a":
+        return _le16(b, 26) & 0x3FFF, _le16(b, 28) & 0x3FFF
+    if kind == b"VP8L" and b[20] == 0x2F:
+        bits = b[21] | (b[22] << 8) | (b[23] << 16) | (b[24] << 24)
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if kind == b"VP8X":
+        return _le24(b, 24) + 1, _le24(b, 27) + 1
+    return None
+
+def _avif_dims(b: bytes) -> tuple[int,int] | None:
+    # 'ispe' property boxes live in meta/iprp/ipco, ahead of mdat; the primary
+    # item is the largest one (others are alpha planes / thumbnails)
+    best, i = None, b.find(b"ispe")
+    while i != -1 and i + 16 <= len(b):
+        w = int.from_bytes(b[i+8:i+12], "big")
+        h = int.from_bytes(b[i+12:i+16], "big")
+        if not best or w * h > best[0] * best[1]:
+            best = (w, h)
+        i = b.find(b"ispe", i + 4)
+    return best
+
+def _sniff_dims(b: bytes) -> tuple[int,int] | None:
+    """(w,h) from the leading bytes of a JPEG/PNG/WebP/AVIF, or None if not (yet) known."""
+    if b[:3] == b"\xff\xd8\xff":
+        return _jpeg_dims(b)
+    if b[:8] == b"\x89PNG\r\n\x1a\n" and b[12:16] == b"IHDR" and len(b) >= 24:
+        return int.from_bytes(b[16:20], "big"), int.from_bytes(b[20:24], "big")
+    if b[:4] == b"RIFF" and b[8:12] == b"WEBP":
+        return _webp_dims(b)
+    if b[4:8] == b"ftyp" and b[8:12] in (b"avif", b"avis", b"mif1", b"heic"):
+        return _avif_dims(b)
+    return None
+
+def _total_length(r: requests.Response) -> int | None:
+    if r.status_code == 206:
+        cr = r.headers.get("Content-Range") or ""      # bytes 0-65535/123456
+        total = cr.rpartition("/")[2].strip()
+        return int(total) if total.isdigit() else None
+    cl = r.headers.get("Content-Length")
+    return int(cl) if cl and cl.isdigit() else None
+
+def _probe(url: str, ua: str, stop: threading.Event | None = None) -> dict | None:
+    """
+    Single ranged GET replacing HEAD + full download: reads only until the
+    dimensions can be sniffed (at most SNIFF_BYTES) and then drops the connection.
+    Returns {status, ct, length, dims} or None on network errors / when `stop` is set.
+    """
+    headers = {"User-Agent": ua, "Range": f"bytes=0-{SNIFF_BYTES - 1}"}
     try:
-        r = requests.head(url, headers={"User-Agent": ua}, allow_redirects=True, timeout=IMG_TIMEOUT)
-        ct = (r.headers.get("Content-Type") or "").lower()
-        if not _is_image_content_type(ct):
-            return False
-        cl = r.headers.get("Content-Length")
-        if cl and cl.isdigit() and int(cl) < MIN_BYTES:
-            return False
-        return True
+        r = requests.get(url, headers=headers, stream=True, allow_redirects=True, timeout=IMG_TIMEOUT)
     except Exception:
-        return False
-
-def _probe_dims(url: str, ua: str) -> tuple[int,int] | None:
+        return None
     try:
-        from PIL import Image  # optional; pip install pillow
-        r = requests.get(url, headers={"User-Agent": ua}, stream=True, timeout=IMG_TIMEOUT)
-        r.raise_for_status()
-        data = BytesIO(r.content if len(r.content) < 2_000_000 else r.raw.read(1_000_000))
-        im = Image.open(data)
-        return im.size  # (w,h)
+        info = {
+            "status": r.status_code,
+            "ct": (r.headers.get("Content-Type") or "").lower(),
+            "length": _total_length(r),
+            "dims": None,
+        }
+        if r.status_code >= 400 or not _is_image_content_type(info["ct"]):
+            return info
+        buf, eof = b"", True
+        for chunk in r.iter_content(SNIFF_CHUNK):
+            if stop is not None and stop.is_set():
+                return None
+            buf += chunk
+            info["dims"] = _sniff_dims(buf)
+            if info["dims"] or len(buf) >= SNIFF_BYTES:
+                eof = False
+                break
+        if eof and info["length"] is None:
+            info["length"] = len(buf)         # whole body fit in the window
+        return info
     except Exception:
         return None
+    finally:
+        r.close()
+
+# concurrent / repeated probes of one image URL within a run share a single request
+_probes = singleflight.Group("image-probes", 4096)
+
+class _Cancelled(Exception):
+    pass
+
+def _probe_once(url: str, ua: str, stop: threading.Event | None = None) -> dict | None:
+    """_probe through _probes. A probe cut short by its caller's `stop` is not
+    memoized; waiters from other resolves then probe for themselves."""
+    def run():
+        info = _probe(url, ua, stop)
+        if info is None and stop is not None and stop.is_set():
+            raise _Cancelled()
+        return info
+    while True:
+        try:
+            return _probes.do(singleflight.url_key(url), run)
+        except _Cancelled:
+            if stop is not None and stop.is_set():
+                return None
+
+def _acceptable(info: dict | None) -> bool:
+    if not info or info["status"] >= 400:
+        return False
+    if not _is_image_content_type(info["ct"]):
+        return False
+    if info["length"] is not None and info["length"] < MIN_BYTES:
+        return False
+    if info["dims"]:
+        w, h = info["dims"]
+        if (w or 0) < 400 or (h or 0) < 250:
+            return False
+    return True
 
 def _first_meta(soup: BeautifulSoup, names: list[str]) -> str | None:
     for n in names:
@@ -51,26 +176,33 @@ def _first_meta(soup: BeautifulSoup, names: list[str]) -> str | None:
             return tag["content"].strip()
     return None
 
+def _jsonld_image_urls(text: str | None) -> list[str]:
+    out = []
+    try:
+        data = json.loads(text or "{}")
+    except Exception:
+        return out
+    items = data if isinstance(data, list) else [data]
+    for obj in items:
+        if not isinstance(obj, dict):
+            continue
+        img = obj.get("image")
+        if isinstance(img, str):
+            out.append(img)
+        elif isinstance(img, dict) and img.get("url"):
+            out.append(img["url"])
+        elif isinstance(img, list):
+            for v in img:
+                if isinstance(v, str):
+                    out.append(v)
+                elif isinstance(v, dict) and v.get("url"):
+                    out.append(v["url"])
+    return out
+
 def _jsonld_images(soup: BeautifulSoup) -> list[str]:
     out = []
     for s in soup.find_all("script", attrs={"type":"application/ld+json"}):
-        try:
-            data = json.loads(s.string or "{}")
-        except Exception:
-            continue
-        items = data if isinstance(data, list) else [data]
-        for obj in items:
-            img = obj.get("image")
-            if isinstance(img, str):
-                out.append(img)
-            elif isinstance(img, dict) and img.get("url"):
-                out.append(img["url"])
-            elif isinstance(img, list):
-                for v in img:
-                    if isinstance(v, str):
-                        out.append(v)
-                    elif isinstance(v, dict) and v.get("url"):
-                        out.append(v["url"])
+        out += _jsonld_image_urls(s.string)
     return out
 
 def _article_imgs(soup: BeautifulSoup) -> list[str]:
@@ -91,38 +223,110 @@ def _article_imgs(soup: BeautifulSoup) -> list[str]:
                 seen.add(src); out.append(src)
     return out
 
-def _valid(url: str, ua: str) -> bool:
+def _valid(url: str, ua: str, stop: threading.Event | None = None) -> bool | None:
+    """True/False, or None when the probe couldn't tell (network error, 408/429/5xx, cancelled)."""
     if not url:
         return False
     low = url.lower()
     if low.endswith(".svg") or low.endswith(".gif"):
         return False
-    if not _head_ok(url, ua):
-        return False
-    dims = _probe_dims(url, ua)
-    if dims:
-        w, h = dims
-        if (w or 0) < 400 or (h or 0) < 250:
-            return False
-    return True
-
-def resolve_best_image(html: str, page_url: str, ua: str) -> str | None:
-    soup = BeautifulSoup(html or "", "lxml")
+    hit = image_cache.get(url)
+    if hit is not None:
+        return hit["ok"]
+    if stop is not None and stop.is_set():
+        return None
+    info = _probe_once(url, ua, stop)
+    if info is None:                       # network error / cancelled: don't remember
+        return None
+    ok = _acceptable(info)
+    image_cache.put(url, info, ok)
+    if not ok and image_cache.transient(info["status"]):
+        return None
+    return ok
 
+def _candidates(soup: BeautifulSoup, page_url: str) -> list[str]:
+    """All image candidates in priority order: meta, JSON-LD, then in-article <img>."""
+    raw = []
     meta = _first_meta(soup, ["og:image","twitter:image","twitter:image:src","image"])
     if meta:
-        url = _abs(meta, page_url)
-        if _valid(url, ua):
-            return url
+        raw.append(meta)
+    raw += _jsonld_images(soup)
+    raw += _article_imgs(soup)
+    return list(dict.fromkeys(_abs(u, page_url) for u in raw if u))
+
+class ProbeFailed(Exception):
+    """No candidate was accepted and some could not be checked: try again later."""
 
-    for raw in _jsonld_images(soup):
-        url = _abs(raw, page_url)
-        if _valid(url, ua):
-            return url
+def _first_acceptable(urls: list[str], ua: str, strict: bool = False) -> str | None:
+    """
+    First acceptable candidate in priority order. Candidates are probed
+    concurrently (PROBE_WORKERS); once a higher-priority one is accepted the
+    pending lower-priority probes are cancelled. Gives up after RESOLVE_DEADLINE.
+    With `strict`, raises ProbeFailed instead of returning None when that None
+    is down to failed probes or the deadline rather than rejections.
+    """
+    if not urls:
+        return None
+    unknown, timed_out = 0, False
+    deadline = time.monotonic() + RESOLVE_DEADLINE
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(urls)))
+    try:
+        futures = [pool.submit(_valid, u, ua, stop) for u in urls]
+        for url, fut in zip(urls, futures):
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise FutureTimeout()
+                ok = fut.result(timeout=remaining)
+            except FutureTimeout:
+                timed_out = True
+                break
+            except Exception:
+                ok = None
+            if ok:
+                return url
+            if ok is None:
+                unknown += 1
+        if strict and (unknown or timed_out):
+            raise ProbeFailed(f"{unknown} candidate probes failed" + (", deadline hit" if timed_out else ""))
+        return None
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
-    for raw in _article_imgs(soup):
-        url = _abs(raw, page_url)
-        if _valid(url, ua):
-            return url
+def resolve_best_image(html: str | bytes, page_url: str, ua: str, encoding: str | None = None,
+                       strict: bool = False) -> str | None:
+    """
+    `html` may be raw bytes with their resolved `encoding` (charsets.py), as
+    rss_reader.lookup_image passes the streamed page. `strict` as in _first_acceptable.
+    """
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, "lxml", from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html or "", "lxml")
+    return _first_acceptable(_candidates(soup, page_url), ua, strict)
 
-    return None
+def candidate_urls(html: str, page_url: str) -> list[str]:
+    """resolve_best_image's candidates in priority order, not probed (see image_queue.py)."""
+    return _candidates(BeautifulSoup(html or "", "lxml"), page_url)
+
+def first_acceptable(urls: list[str], ua: str) -> str | None:
+    """
+    For image_queue: None means every candidate was rejected; raises ProbeFailed
+    when the outcome is unknown (CDN down, rate limited), so the job is retried.
+    """
+    return _first_acceptable(urls, ua, strict=True)
+
+def resolve_from_head(head: dict, page_url: str, ua: str, strict: bool = False) -> str | None:
+    """Same priority as resolve_best_image, from head_fetch.parse_head output (meta + JSON-LD only)."""
+    raw = []
+    meta = head.get("meta") or {}
+    for n in ("og:image","twitter:image","twitter:image:src","image"):
+        if meta.get(n):
+            raw.append(meta[n])
+            break
+    for block in head.get("jsonld") or []:
+        raw += _jsonld_image_urls(block)
+    base = head.get("url") or page_url
+    return _first_acceptable(list(dict.fromkeys(_abs(u, base) for u in raw if u)), ua, strict)
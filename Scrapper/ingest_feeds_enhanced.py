@@ -1,23 +1,34 @@
 # ingest_feeds_enhanced.py
-import os, re, time, json, requests, feedparser, hashlib, math
+# Parsers (bs4/lxml, readability, trafilatura, feedparser, dateutil, PyPDF2) are
+# imported inside the functions that use them, so importing this module and runs
+# that never reach a page stay cheap. bench/bench_imports.py keeps it that way.
+import os, re, time, json, argparse, requests, hashlib, math
 from datetime import datetime, timedelta, timezone
-from dateutil import parser as dateparse
-from PyPDF2 import PdfReader
-from bs4 import BeautifulSoup, NavigableString
-from readability import Document
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from collections import Counter, defaultdict
+from typing import TYPE_CHECKING
+import strategy_stats, keyword_engine, charsets, singleflight, feed_yield, related_index
+from article_text import ArticleText
 
-# Optional, but strongly recommended for better extraction
-try:
-    import trafilatura
-    from trafilatura.settings import use_config
-    TRAFILATURA_OK = True
-except Exception:
-    TRAFILATURA_OK = False
+if TYPE_CHECKING:                          # annotations only; bs4 loads on first use
+    from bs4 import BeautifulSoup
+
+# Optional, but strongly recommended for better extraction; loaded on first use
+_trafilatura = None
+
+def trafilatura_ok() -> bool:
+    global _trafilatura
+    if _trafilatura is None:
+        try:
+            import trafilatura, trafilatura.settings
+            _trafilatura = trafilatura
+        except Exception:
+            _trafilatura = False
+    return _trafilatura is not False
 
 API_URL   = os.getenv("API_URL", "http://localhost:5000/api/stories/bulk")
 PDF_PATH  = os.getenv("RSS_PDF", "rss-urls-1.pdf")
+FEED_LIST_CACHE = os.getenv("FEED_LIST_CACHE", ".cache/feed_urls.json")   # PDF text extraction, keyed by mtime/size
 
 # ---------- knobs ----------
 CUTOFF_DAYS         = int(os.getenv("CUTOFF_DAYS", "5"))
@@ -29,6 +40,14 @@ MIN_WORDS           = int(os.getenv("MIN_WORDS", "120"))
 SLEEP_BETWEEN_FEEDS = float(os.getenv("SLEEP_BETWEEN_FEEDS", "0.2"))
 WPM                 = int(os.getenv("WPM", "250"))
 IMG_SECONDS         = int(os.getenv("IMG_SECONDS", "10"))
+IMG_DERIVATIVES     = os.getenv("IMG_DERIVATIVES", "0") == "1"   # pre-sized WebP variants per story
+IMG_PHASH           = os.getenv("IMG_PHASH", "0") == "1"         # download pixels to merge near-duplicate photos
+KEYWORDS            = os.getenv("KEYWORDS", "tfidf")              # tfidf (per batch in post_batch, filler words sink) | cheap
+WEBSUB              = os.getenv("WEBSUB", "0") == "1"            # record feed hubs for websub.py push delivery
+SINK                = os.getenv("SINK", "api")                    # api (POST now) | spool (durable, see spool.py)
+PAGE_MEMO           = int(os.getenv("PAGE_MEMO", "64"))           # fetched article pages kept for duplicate links
+DEADLINE            = float(os.getenv("RUN_DEADLINE", "0"))       # seconds; 0 = no time budget (see --deadline)
+DEADLINE_RESERVE    = float(os.getenv("DEADLINE_RESERVE", "20"))  # stop starting stories this long before it (at most 20% of it)
 # ---------------------------
 
 UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -82,6 +101,7 @@ def make_fingerprint(source: str, guid: str, title: str, published_iso: str, can
     return hashlib.sha256(basis.encode("utf-8")).hexdigest()
 
 def extract_urls_from_pdf(pdf_path: str) -> list[str]:
+    from PyPDF2 import PdfReader
     reader = PdfReader(pdf_path)
     text = "\n".join((page.extract_text() or "") for page in reader.pages)
     urls = URL_RE.findall(text)
@@ -92,6 +112,28 @@ def extract_urls_from_pdf(pdf_path: str) -> list[str]:
             seen.add(u); deduped.append(u)
     return deduped
 
+def feed_urls(pdf_path: str) -> list[str]:
+    """extract_urls_from_pdf, reused while the PDF is unchanged (skips PyPDF2 entirely)."""
+    st = os.stat(pdf_path)
+    key = {"path": os.path.abspath(pdf_path), "mtime": st.st_mtime_ns, "size": st.st_size}
+    try:
+        with open(FEED_LIST_CACHE, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["urls"]
+    except Exception:
+        pass
+    urls = extract_urls_from_pdf(pdf_path)
+    try:
+        os.makedirs(os.path.dirname(FEED_LIST_CACHE) or ".", exist_ok=True)
+        tmp = FEED_LIST_CACHE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "urls": urls}, f)
+        os.replace(tmp, FEED_LIST_CACHE)
+    except Exception as e:
+        print("feed list cache not saved:", e)
+    return urls
+
 def categorize_feed(url: str) -> str | None:
     lu = url.lower()
     if any(d in lu for d in SPORTS_DOMAINS): return "sports"
@@ -102,7 +144,18 @@ def categorize_feed(url: str) -> str | None:
     if "blog" in lu:                          return "blogs"
     return None
 
-def req_get(url: str, timeout: int) -> requests.Response | None:
+# --deadline: stories are started until _stop_at; every timeout is cut to the
+# time left, so one slow page or POST cannot carry the run past the budget
+_stop_at: float | None = None       # monotonic; stop starting stories (page/image fetches end here)
+_end_at: float | None = None        # monotonic; the deadline itself (the final flush ends here)
+
+def time_left(limit: float, until: float | None) -> float:
+    """`limit` cut to the seconds left before `until` (at least 1)."""
+    if until is None:
+        return limit
+    return max(1.0, min(limit, until - time.monotonic()))
+
+def req_get(url: str, timeout: float) -> requests.Response | None:
     try:
         r = requests.get(url, headers={"User-Agent": UA}, timeout=timeout)
         r.raise_for_status()
@@ -112,24 +165,29 @@ def req_get(url: str, timeout: int) -> requests.Response | None:
 
 def readability_extract(html: str) -> tuple[str|None, str|None]:
     try:
+        from readability import Document
         doc = Document(html)
         content_html = doc.summary(html_partial=True)
         return content_html, doc.title()
     except Exception:
         return None, None
 
-def trafilatura_extract(url: str, html: str | None = None) -> dict:
-    """Return dict with keys: text, title, html, images(list of urls) if available."""
-    if not TRAFILATURA_OK:
+def trafilatura_extract(url: str, html=None) -> dict:
+    """
+    Return dict with keys: text, title, html, images(list of urls) if available.
+    `html` may be a string or an already parsed lxml tree.
+    """
+    if not trafilatura_ok():
         return {}
-    cfg = use_config()
+    trafilatura = _trafilatura
+    cfg = trafilatura.settings.use_config()
     cfg.set("DEFAULT", "EXTRACTION_TIMEOUT", "0")  # disable per-page hard timeout
     try:
-        if html:
-            res = trafilatura.extract(html, output="json", with_metadata=True, include_comments=False, config=cfg)
+        if html is not None:
+            res = trafilatura.extract(html, output_format="json", with_metadata=True, include_comments=False, config=cfg)
         else:
             downloaded = trafilatura.fetch_url(url, config=cfg, no_ssl=True)
-            res = trafilatura.extract(downloaded, output="json", with_metadata=True, include_comments=False, config=cfg)
+            res = trafilatura.extract(downloaded, output_format="json", with_metadata=True, include_comments=False, config=cfg)
         if not res:
             return {}
         data = json.loads(res)
@@ -142,10 +200,11 @@ def trafilatura_extract(url: str, html: str | None = None) -> dict:
     except Exception:
         return {}
 
-def html_to_soup(html: str) -> BeautifulSoup:
+def html_to_soup(html: str) -> "BeautifulSoup":
+    from bs4 import BeautifulSoup
     return BeautifulSoup(html or "", "lxml")
 
-def clean_junk(soup: BeautifulSoup) -> None:
+def clean_junk(soup: "BeautifulSoup") -> None:
     junk_selectors = [
         ".share",".social",".advert",".ad",".promo",".newsletter",
         ".caption",".credit",".byline",".meta",".tag-list",".breadcrumbs",
@@ -159,6 +218,7 @@ def extract_paragraphs_and_images(content_html: str) -> tuple[list[str], list[di
     """
     Returns (paragraphs, contentImages[{index,url,alt}], all_images[], thumbnail)
     """
+    from bs4 import NavigableString
     soup = html_to_soup(content_html)
     clean_junk(soup)
 
@@ -256,12 +316,13 @@ def best_entry_html(entry) -> str | None:
 def best_entry_text(entry) -> str:
     val = entry.get("summary") or entry.get("description")
     if not val: return ""
-    soup = BeautifulSoup(val, "lxml")
+    soup = html_to_soup(val)
     for t in soup(["script","style","noscript"]): t.extract()
     text = soup.get_text(separator=" ")
     return re.sub(r"\s+", " ", text).strip()
 
 def parse_date(entry):
+    from dateutil import parser as dateparse
     for key in ("published","updated","created"):
         val = getattr(entry, key, None) or entry.get(key)
         if val:
@@ -274,13 +335,16 @@ def parse_date(entry):
                 pass
     return None
 
-def cheap_keywords(text: str, topn: int = 10) -> list[str]:
-    words = re.findall(r"[A-Za-z][A-Za-z\-']+", text)
-    norm = [w.lower() for w in words if w.lower() not in STOP and len(w) > 2]
+WORD_RE = re.compile(r"[a-z][a-z\-']+")
+CAPS_RE = re.compile(r"(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,3})")
+
+def cheap_keywords(article: ArticleText, topn: int = 10) -> list[str]:
+    # the lowercased buffer is shared with guess_category
+    norm = [w for w in WORD_RE.findall(article.lower) if w not in STOP and len(w) > 2]
     freq = Counter(norm)
 
     # capture simple capitalized multi-words (names/teams/titles)
-    caps = re.findall(r"(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,3})", text)
+    caps = CAPS_RE.findall(article.text)
     caps = [c.strip() for c in caps if len(c.split())<=4]
     for c in caps:
         token = c.lower()
@@ -289,9 +353,8 @@ def cheap_keywords(text: str, topn: int = 10) -> list[str]:
 
     return [k.replace(" ", "-") for k,_ in freq.most_common(topn)]
 
-def guess_category(source_title: str, link: str, text: str) -> str | None:
-    s = (source_title or "") + " " + (link or "") + " " + (text or "")
-    s = s.lower()
+def guess_category(source_title: str, link: str, article: ArticleText) -> str | None:
+    s = ((source_title or "") + " " + (link or "")).lower() + " " + article.lower
     if any(d in s for d in SPORTS_DOMAINS) or any(h in s for h in SPORTS_HINTS):
         return "sports"
     if any(d in s for d in MOVIE_DOMAINS) or any(h in s for h in MOVIE_HINTS):
@@ -300,22 +363,114 @@ def guess_category(source_title: str, link: str, text: str) -> str | None:
         return "blogs"
     return None
 
-def compute_read_time(words: int, n_images: int) -> str:
-    minutes = words / max(WPM, 150)
-    bonus = (n_images * IMG_SECONDS) / 60.0
-    total = minutes + bonus
+def compute_read_time(article: ArticleText, n_images: int) -> str:
+    total = article.read_minutes(max(WPM, 150), n_images, IMG_SECONDS)
     m = max(1, int(round(total)))
     return f"{m} min read"
 
+_spool = None
+
+def spool_sink():
+    global _spool
+    if _spool is None:
+        from spool import Spool
+        _spool = Spool()
+    return _spool
+
+def close_sink() -> None:
+    """Seal the open spool segment so the drainer picks it up."""
+    if _spool is not None:
+        _spool.close()
+        print(f"Spooled {_spool.stats['records']} stories in {_spool.stats['segments']} segment(s)")
+
+def seal_sink() -> None:
+    """Hand the open spool segment to the drainer now (long-running writers, when idle)."""
+    if _spool is not None:
+        _spool.seal()
+
 def post_batch(items_batch):
+    if KEYWORDS == "tfidf":
+        keyword_engine.tag_stories(items_batch, STOP, topn=10)   # one pass per batch
+    related_index.annotate(items_batch)      # needs the tags
+    if IMG_DERIVATIVES and _stop_at is not None and time.monotonic() >= _stop_at:
+        print("Derivatives: deadline reached, skipped for this batch")
+    elif IMG_DERIVATIVES:
+        from image_derivatives import attach_derivatives
+        attach_derivatives(items_batch)
+    if SINK == "spool":
+        spool_sink().append(items_batch)
+        return
     try:
-        resp = requests.post(API_URL, json={"items": items_batch}, timeout=REQUEST_TIMEOUT)
+        resp = requests.post(API_URL, json={"items": items_batch},
+                             timeout=time_left(REQUEST_TIMEOUT, _end_at))
         print("Posted batch:", len(items_batch), resp.status_code)
         if resp.status_code >= 400:
             print(resp.text[:500])
     except Exception as e:
         print("POST error:", e)
 
+# the same article reached through several feeds is fetched once per run
+_pages  = singleflight.Group("pages", PAGE_MEMO)      # canonical url -> (body, encoding)
+_pixels = singleflight.Group("pixels")                # image url -> fetch_pixels() result
+
+def fetch_page_body(link: str) -> tuple[bytes | None, str | None]:
+    def fetch():
+        r = req_get(link, time_left(PAGE_TIMEOUT, _stop_at))
+        return charsets.response_body(r) if r else (None, None)
+    return _pages.do(canonicalize_url(link) or link, fetch)
+
+PAGE_STRATEGIES     = ["trafilatura", "readability"]     # need the article page; reordered per domain
+LAST_RESORT         = ["summary"]                        # cheap but no article body or images: always last
+
+def run_strategy(name: str, entry, link: str, page: dict):
+    """
+    One fallback extraction. Returns (article, cimgs, images, thumb) when it clears
+    MIN_WORDS (image fields None = keep the entry's), else None. `page` caches the
+    article bytes and their encoding so the fetch is paid at most once per entry.
+    """
+    def page_body():
+        if "body" not in page:
+            t0 = time.monotonic()
+            page["body"], page["encoding"] = fetch_page_body(link)
+            page["fetch_secs"] = time.monotonic() - t0      # ~0 when another feed already fetched it
+        return page["body"]
+
+    def page_html():
+        if "html" not in page:
+            body = page_body()
+            page["html"] = charsets.decode(body, page["encoding"]) if body else None
+        return page["html"]
+
+    if name == "trafilatura":
+        if not trafilatura_ok():
+            return None
+        body = page_body()
+        tree = None
+        if body:
+            try:
+                tree = charsets.html_tree(body, page["encoding"])    # parsed from bytes, no re-detection
+            except Exception:
+                tree = None
+        tf = trafilatura_extract(link, tree)
+        if tf.get("text"):
+            a2 = ArticleText(split_paragraphs_plain(tf["text"]))
+            if a2.words >= MIN_WORDS:
+                return a2, None, None, None
+    elif name == "readability":
+        html = page_html()
+        if html:
+            content_html, _ = readability_extract(html)
+            if content_html:
+                p3, ci3, im3, th3 = extract_paragraphs_and_images(content_html)
+                a3 = ArticleText(p3)
+                if a3.words >= MIN_WORDS:
+                    return a3, ci3, im3, th3
+    elif name == "summary":
+        a4 = ArticleText(split_paragraphs_plain(best_entry_text(entry)))
+        if a4.words >= MIN_WORDS:
+            return a4, None, None, None
+    return None
+
 def clean_one(feed, entry):
     link  = entry.get("link")
     title = (entry.get("title") or "").strip()
@@ -323,44 +478,32 @@ def clean_one(feed, entry):
         return None
 
     # 1) try entry-embedded html
-    paras, cimgs, images, thumb = [], [], [], None
+    article, cimgs, images, thumb = ArticleText(), [], [], None
     entry_html = best_entry_html(entry)
     if entry_html:
         p, ci, im, th = extract_paragraphs_and_images(entry_html)
-        paras, cimgs, images, thumb = p, ci, im, th
-
-    # 2) if too short, fetch full article
-    if sum(len(p.split()) for p in paras) < MIN_WORDS:
-        r = req_get(link, PAGE_TIMEOUT)
-        html = r.text if r else None
-
-        if TRAFILATURA_OK:
-            tf = trafilatura_extract(link, html)
-        else:
-            tf = {}
-
-        used_any = False
-        if tf.get("text"):
-            p2 = split_paragraphs_plain(tf["text"])
-            if sum(len(x.split()) for x in p2) >= MIN_WORDS:
-                paras = p2; used_any = True
-
-        if not used_any and html:
-            content_html, _ = readability_extract(html)
-            if content_html:
-                p3, ci3, im3, th3 = extract_paragraphs_and_images(content_html)
-                if sum(len(x.split()) for x in p3) >= MIN_WORDS:
-                    paras, cimgs, images, thumb = p3, ci3, im3, th3
-                    used_any = True
-
-        if not used_any:
-            # fallback to summary/description
-            text_fb = best_entry_text(entry)
-            p4 = split_paragraphs_plain(text_fb)
-            if sum(len(x.split()) for x in p4) >= MIN_WORDS:
-                paras = p4
-
-    if sum(len(p.split()) for p in paras) < MIN_WORDS:
+        article, cimgs, images, thumb = ArticleText(p), ci, im, th
+
+    # 2) if too short, try the page strategies, historically best first for this domain, then the summary
+    if article.words < MIN_WORDS:
+        domain = strategy_stats.domain_of(link)
+        page = {}
+        for name in strategy_stats.order(domain, PAGE_STRATEGIES) + LAST_RESORT:
+            fetched = "body" in page
+            t0 = time.monotonic()
+            got = run_strategy(name, entry, link, page)
+            secs = time.monotonic() - t0
+            if name in PAGE_STRATEGIES:
+                if fetched:
+                    secs += page["fetch_secs"]    # charge the shared fetch to every page strategy
+                strategy_stats.record(domain, name, got is not None, secs)
+            if got is not None:
+                article = got[0]
+                if got[1] is not None:
+                    cimgs, images, thumb = got[1], got[2], got[3]
+                break
+
+    if article.words < MIN_WORDS:
         return None
 
     # Feed/media images as additional hints
@@ -374,25 +517,30 @@ def clean_one(feed, entry):
     except Exception:
         pass
 
-    images = list(dict.fromkeys([u for u in images if u]))
+    # same photo at several sizes / CDN params -> keep the largest rendition
+    from image_dedupe import dedupe_images, dedupe_content_images, fetch_pixels, PIXEL_TIMEOUT
+    load = (lambda u: _pixels.do(singleflight.url_key(u),
+                                 lambda: fetch_pixels(u, UA, time_left(PIXEL_TIMEOUT, _stop_at)))) if IMG_PHASH else None
+    images, kept = dedupe_images([u for u in images if u], load=load)
+    cimgs = dedupe_content_images(cimgs, kept)
+    thumb = kept.get(thumb, thumb)
     if not thumb and images:
         thumb = images[0]
 
-    text_full = " ".join(paras)
-    tags = cheap_keywords(text_full, topn=10)
+    # tfidf: left empty here and filled for the whole batch by post_batch
+    tags = cheap_keywords(article, topn=10) if KEYWORDS == "cheap" else []
 
     dt = parse_date(entry)
     published_iso = dt.isoformat() if dt else None
 
     source_title = (feed.feed.get("title") or feed.feed.get("link") or "").strip()
-    category = guess_category(source_title, link, text_full)
+    category = guess_category(source_title, link, article)
 
     canonical_url = canonicalize_url(link)
     guid = entry.get("id") or entry.get("guid")
     fingerprint = make_fingerprint(source_title, guid or "", title, published_iso or "", canonical_url or "")
 
-    words = len(text_full.split())
-    read_time = compute_read_time(words, len(images) or len(cimgs))
+    read_time = compute_read_time(article, len(images) or len(cimgs))
 
     # Final story doc your fanout script can consume
     story = {
@@ -402,8 +550,8 @@ def clean_one(feed, entry):
         "guid": guid,
         "fingerprint": fingerprint,
 
-        "summary": text_full[:2000],
-        "content": paras,                 # ARRAY of paragraphs
+        "summary": article.summary(2000),
+        "content": article.paras,         # ARRAY of paragraphs
         "contentImages": cimgs,           # [{index,url,alt}]
         "images": images,                 # gallery
         "thumbnail": thumb,
@@ -421,43 +569,81 @@ def clean_one(feed, entry):
     }
     return story
 
+def within_cutoff(doc, cutoff) -> bool:
+    if doc.get("publishedAt"):
+        try:
+            from dateutil import parser as dateparse
+            dt = dateparse.parse(doc["publishedAt"])
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            if dt < cutoff:
+                return False
+        except Exception:
+            pass
+    return True
+
 def main():
-    urls = extract_urls_from_pdf(PDF_PATH)
+    ap = argparse.ArgumentParser(description="ingest RSS feeds into the stories API")
+    ap.add_argument("--deadline", type=float, default=DEADLINE,
+                    help="time budget in seconds: feeds run highest-yield first and the run stops "
+                         "cleanly (batch flushed, stats saved) before the budget is spent")
+    args = ap.parse_args()
+    if IMG_DERIVATIVES and not os.getenv("IMG_DERIV_BASE_URL"):
+        raise SystemExit("IMG_DERIVATIVES=1 needs IMG_DERIV_BASE_URL: the public URL that serves IMG_DERIV_DIR")
+    global _stop_at, _end_at
+    t_start = time.monotonic()
+    # short budgets keep 80% for work rather than leaving none at all
+    reserve = min(DEADLINE_RESERVE, args.deadline * 0.2)
+    stop_at = t_start + args.deadline - reserve if args.deadline > 0 else None
+    _stop_at, _end_at = stop_at, (t_start + args.deadline if stop_at is not None else None)
+
+    import feedparser
+    urls = feed_urls(PDF_PATH)
     selected = []
     for u in urls:
         cat = categorize_feed(u)
         if cat:
             selected.append((u, cat))
     print(f"Selected {len(selected)} feeds")
+    if stop_at is not None:
+        selected = feed_yield.schedule(selected)
+        print(f"Deadline {args.deadline:.0f}s: highest-yield feeds first, every category covered")
 
     cutoff = datetime.now(timezone.utc) - timedelta(days=CUTOFF_DAYS)
     batch = []
+    done = 0
 
     for url, cat_hint in selected:
+        if stop_at is not None and time.monotonic() >= stop_at:
+            break
         print("Feed:", url, "->", cat_hint)
-        r = req_get(url, REQUEST_TIMEOUT)
+        t_feed = time.monotonic()
+        done += 1
+        r = req_get(url, time_left(REQUEST_TIMEOUT, stop_at))
         if not r:
+            feed_yield.record(url, 0, time.monotonic() - t_feed)
             print("  fetch error -> skipped"); continue
         feed = feedparser.parse(r.content)
         if getattr(feed, "bozo", 0) and not getattr(feed, "entries", None):
+            feed_yield.record(url, 0, time.monotonic() - t_feed)
             print("  Skipping (bozo/no entries)"); continue
+        if WEBSUB:
+            import websub
+            if websub.note_feed(url, feed, r.headers.get("Link"), cat_hint):
+                print("  hub advertised -> websub")
 
         count = 0
         for e in feed.entries:
             if count >= MAX_ITEMS_PER_FEED: break
+            if stop_at is not None and time.monotonic() >= stop_at:
+                print("  deadline reached")
+                break
             doc = clean_one(feed, e)
             if not doc: continue
 
             # date filter
-            if doc.get("publishedAt"):
-                try:
-                    dt = dateparse.parse(doc["publishedAt"])
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    if dt < cutoff:
-                        continue
-                except Exception:
-                    pass
+            if not within_cutoff(doc, cutoff):
+                continue
 
             batch.append(doc)
             count += 1
@@ -466,10 +652,22 @@ def main():
                 post_batch(batch)
                 batch = []
 
+        feed_yield.record(url, count, time.monotonic() - t_feed)
         time.sleep(SLEEP_BETWEEN_FEEDS)
 
+    if done < len(selected):
+        left = Counter(cat for _, cat in selected[done:])
+        print(f"Deadline: {len(selected) - done} feeds not reached ({dict(left)}) "
+              f"after {time.monotonic() - t_start:.0f}s")
     if batch:
         post_batch(batch)
+    close_sink()
+    strategy_stats.save()
+    keyword_engine.save()
+    related_index.save()
+    feed_yield.save()
+    _pages.report()
+    _pixels.report()
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+# json_stream.py
+# Incremental JSON array reader: yields array elements as the bytes arrive, so
+# a huge /api/stories response never has to be held in memory as a whole.
+import json, codecs
+
+_dec = json.JSONDecoder()
+_WS = " \t\r\n"
+COMPACT_AT = 1 << 16
+
+class _Buf:
+    def __init__(self, chunks):
+        self._it = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.s, self.pos, self.eof = "", 0, False
+
+    def fill(self) -> bool:
+        """Append the next chunk; False once the input is exhausted."""
+        if self.eof:
+            return False
+        if self.pos >= COMPACT_AT or self.pos > len(self.s) // 2:
+            self.s, self.pos = self.s[self.pos:], 0
+        for chunk in self._it:
+            if chunk:
+                self.s += self._utf8.decode(chunk)
+                return True
+        self.s += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace char ('' at end of input)."""
+        while True:
+            while self.pos < len(self.s) and self.s[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.s):
+                return self.s[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"expected {ch!r} at {self.pos}, got {got!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _dec.raw_decode(self.s, self.pos)
+                # a number may be cut at the chunk boundary: only trust it with a delimiter after it
+                if end < len(self.s) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.fill():
+                raise ValueError("truncated JSON")
+
+def _array(b: _Buf):
+    b.expect("[")
+    if b.peek() == "]":
+        b.pos += 1
+        return
+    while True:
+        yield b.value()
+        c = b.peek()
+        b.pos += 1
+        if c == "]":
+            return
+        if c != ",":
+            raise ValueError(f"expected ',' or ']' at {b.pos}, got {c!r}")
+
+def iter_json_items(chunks, meta: dict | None = None):
+    """
+    Yield the elements of a top-level JSON array, or of the "items" array of a
+    top-level object, from an iterable of byte chunks. The object's other keys
+    (e.g. "page") are stored into `meta` as they are parsed.
+    """
+    b = _Buf(chunks)
+    c = b.peek()
+    if c == "[":
+        yield from _array(b)
+        return
+    if c != "{":
+        raise ValueError(f"expected a JSON array or object, got {c!r}")
+    b.pos += 1
+    if b.peek() == "}":
+        return
+    while True:
+        key = b.value()
+        b.expect(":")
+        if key == "items" and b.peek() == "[":
+            yield from _array(b)
+        else:
+            val = b.value()
+            if meta is not None:
+                meta[key] = val
+        c = b.peek()
+        b.pos += 1
+        if c == "}":
+            return
+        if c != ",":
+            raise ValueError(f"expected ',' or '}}' at {b.pos}, got {c!r}")
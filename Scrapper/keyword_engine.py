@@ -0,0 +1,158 @@
+# keyword_engine.py
+# Batch tag extraction for the ingest: one regex pass over a whole batch for words,
+# one for capitalized phrases, ranked by TF-IDF against document frequencies that
+# are kept across runs (.cache/keyword_df.json), so words every story uses sink.
+import os, re, json, math, heapq, threading
+from collections import Counter
+import file_lock
+
+DF_PATH      = os.getenv("KEYWORD_DF_PATH", ".cache/keyword_df.json")
+DF_MAX_TERMS = int(os.getenv("KEYWORD_DF_MAX_TERMS", "200000"))   # prune rarest terms above this
+DF_WINDOW    = int(os.getenv("KEYWORD_DF_WINDOW", "500000"))       # halve all counts past this many docs
+CAPS_BOOST   = 2                                                    # same light boost as cheap_keywords
+
+# Documents are joined with a sentinel word both patterns match on their own, so
+# the patterns need no "|separator" alternative (which defeats the regex engine's
+# literal-prefix scan and made the whole pass several times slower).
+SEP_WORD = "qqdocbreakqq"
+SEP_LOWER = f"\n.{SEP_WORD}.\n"
+SEP_TEXT  = f"\n.{SEP_WORD.capitalize()}.\n"
+WORD_RE = re.compile(r"[a-z][a-z\-']+")                               # on the lowercased batch
+CAPS_RE = re.compile(r"[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,3}")
+
+_lock = threading.Lock()
+_df: dict | None = None
+_new_df: Counter = Counter()     # counts added since the last save, merged into the file
+_new_docs = 0
+
+def _read() -> dict:
+    try:
+        with open(DF_PATH, encoding="utf-8") as f:
+            store = json.load(f)
+        store.setdefault("docs", 0)
+        store.setdefault("df", {})
+        return store
+    except Exception:
+        return {"docs": 0, "df": {}}
+
+def _load() -> dict:
+    global _df
+    if _df is None:
+        _df = _read()
+    return _df
+
+def _halve(store: dict) -> None:
+    if store["docs"] > DF_WINDOW:
+        store["docs"] //= 2
+        store["df"] = {t: c // 2 for t, c in store["df"].items() if c > 1}
+
+def _split_docs(tokens: list[str], n: int, sep: str) -> list[list[str]]:
+    # list.index finds the separators in C; the docs are plain slices
+    docs, start = [], 0
+    for _ in range(n - 1):
+        end = tokens.index(sep, start)
+        docs.append(tokens[start:end])
+        start = end + 1
+    docs.append(tokens[start:])
+    return docs
+
+# sublinear term frequency (1 + log tf): a filler word repeated 20 times should
+# not outweigh a rarer name mentioned a handful of times
+_TF = [0.0] + [1.0 + math.log(c) for c in range(1, 256)]
+
+def extract_batch(articles, stop: set[str], topn: int = 10) -> list[list[str]]:
+    """
+    Tags for each ArticleText in `articles`, best first, "-" joined like
+    cheap_keywords. Candidates are the same (non-stopword words of 3+ letters,
+    capitalized phrases of up to 4 words with a boost); the ranking is
+    (1 + log tf) * idf over the stored corpus. The batch is then added to it.
+    """
+    global _new_docs
+    n = len(articles)
+    if not n:
+        return []
+    words = _split_docs(WORD_RE.findall(SEP_LOWER.join(a.lower for a in articles)), n, SEP_WORD)
+    phrases = _split_docs(CAPS_RE.findall(SEP_TEXT.join(a.text for a in articles)), n, SEP_WORD.capitalize())
+
+    freqs = []
+    for ws, ps in zip(words, phrases):
+        freq = Counter(ws)
+        for w in [w for w in freq if len(w) < 3 or w in stop]:
+            del freq[w]
+        for p in ps:
+            token = p.lower()
+            if token not in stop:
+                freq[token] += CAPS_BOOST
+        freqs.append(freq)
+
+    with _lock:
+        store = _load()
+        df, total = store["df"], store["docs"]
+        log_n = math.log(1 + total) + 1
+        idf: dict[str, float] = {}
+        out = []
+        for freq in freqs:
+            sc = {}
+            for term, c in freq.items():
+                w = idf.get(term)
+                if w is None:
+                    w = idf[term] = log_n - math.log(1 + df.get(term, 0))
+                sc[term] = (_TF[c] if c < 256 else 1.0 + math.log(c)) * w
+            best = heapq.nlargest(topn, sc, key=sc.get)
+            out.append([k.replace(" ", "-") for k in best])
+        for freq in freqs:
+            for term in freq:
+                df[term] = df.get(term, 0) + 1
+            _new_df.update(freq.keys())
+        store["docs"] = total + n
+        _new_docs += n
+        _halve(store)
+    return out
+
+class _Paras:
+    """The two buffers extract_batch reads, rebuilt from a posted story's paragraphs."""
+    __slots__ = ("text", "lower")
+
+    def __init__(self, paras: list[str]):
+        self.text = " ".join(paras)
+        self.lower = self.text.lower()
+
+def tag_stories(items: list[dict], stop: set[str], topn: int = 10) -> int:
+    """
+    Fill `tags` on the stories that have none, in one extract_batch pass over
+    their `content` paragraphs. Works on the plain story dicts, so whatever
+    serializes a batch can call it first. Returns how many were tagged.
+    """
+    todo = [it for it in items if not it.get("tags")]
+    if not todo:
+        return 0
+    for it, tags in zip(todo, extract_batch([_Paras(it.get("content") or []) for it in todo], stop, topn)):
+        it["tags"] = tags
+    return len(todo)
+
+def save() -> None:
+    """
+    Add this process's new counts to the file. The cron ingest and websub.py
+    both extract, so the file is re-read under a lock and merged, not overwritten.
+    """
+    global _df, _new_docs
+    with _lock:
+        if not _new_docs:
+            return
+        with file_lock.locked(DF_PATH + ".lock"):
+            store = _read()
+            df = store["df"]
+            for term, c in _new_df.items():
+                df[term] = df.get(term, 0) + c
+            store["docs"] += _new_docs
+            _halve(store)
+            if len(store["df"]) > DF_MAX_TERMS:
+                keep = heapq.nlargest(DF_MAX_TERMS, store["df"].items(), key=lambda kv: kv[1])
+                store["df"] = dict(keep)
+            tmp = DF_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(store, f, separators=(",", ":"), ensure_ascii=False)
+            os.replace(tmp, DF_PATH)
+        _df = store
+        _new_df.clear()
+        _new_docs = 0
@@ -0,0 +1,357 @@
+# local_api.py
+# In-memory stand-in for the Express backend, enough to run the fanout scripts
+# without MongoDB: GET /api/stories (offset and cursor pages), the movies/blogs/
+# sports bulk endpoints (and the ingest's /api/stories/bulk), injected latency /
+# 413 / 409 / 500, and payload capture.
+#   python local_api.py --port 5055 --stories 2000 --latency 0.02 --error-rate 0.05
+#   API_BASE=http://127.0.0.1:5055 python fanout_to_collections_enhanced.py
+#   API_BASE=http://127.0.0.1:5055 MOVIES_BULK=/api/movies/bulk BLOGS_BULK=/api/blogs/bulk \
+#       SPORTS_BULK=/api/sports/bulk python projector_all_stories.py
+import os, json, time, random, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timedelta, timezone
+
+COLLECTIONS = {"/api/movies": "movies", "/api/blogs": "blogs", "/api/sports": "sports"}
+PAGE_MAX = 1000
+SITE_OWNED = ("views", "comments", "featured")     # not overwritten by later bulk upserts
+
+WORDS = ("the a report says after new season first week city team fans star show said year people world "
+         "game night release plans story latest watch big top best coach final trailer director").split()
+CUES = {
+    "sports": ["football", "cricket", "tennis", "nba", "olympic"],
+    "movies": ["film", "hollywood", "trailer", "series", "box-office"],
+    "blogs":  ["opinion", "essay", "column", "analysis"],
+}
+
+def synth_stories(n: int, seed: int = 7, paragraphs: int = 8) -> list[dict]:
+    """Story documents shaped like the Story model, spread over all three labels."""
+    rnd = random.Random(seed)
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    labels = list(CUES)
+    out = []
+    for i in range(n):
+        label = labels[i % 3]
+        words = rnd.choices(WORDS, k=rnd.randint(8, 14)) + [rnd.choice(CUES[label])]
+        rnd.shuffle(words)
+        img = f"https://img.example.com/{i}.jpg"
+        created = (t0 + timedelta(seconds=i // 2)).isoformat().replace("+00:00", ".000Z")
+        out.append({
+            "_id": f"{i:024x}",
+            "fingerprint": f"fp{i}",
+            "title": " ".join(words).capitalize(),
+            "summary": " ".join(rnd.choices(WORDS, k=40)),
+            "content": "\n\n".join(" ".join(rnd.choices(WORDS, k=rnd.randint(40, 90))) for _ in range(paragraphs)),
+            "contentImages": [{"index": 2, "url": img, "alt": ""}],
+            "image": img,
+            "thumbnail": img,
+            "images": [img] if rnd.random() < 0.8 else [],
+            "tags": rnd.sample(WORDS, 3) + [rnd.choice(CUES[label])],
+            "category": rnd.choice(["", "", label]),
+            "source": rnd.choice(["ESPN", "Variety", "Medium", "Reuters"]),
+            "author": "Staff",
+            "publishedAt": (t0 + timedelta(minutes=i)).isoformat(),
+            "readTime": f"{rnd.randint(2, 9)} min read",
+            "createdAt": created,
+            "updatedAt": created,
+        })
+    return out
+
+def _revision(s: dict) -> tuple[str, str]:
+    # incremental cursor order, (updatedAt, _id) like storiesAfterCursor
+    return s.get("updatedAt") or s.get("createdAt") or "", s.get("_id") or ""
+
+class LocalAPI:
+    """
+    api = LocalAPI(stories, latency=0.02, body_limit=1 << 20).start(port)
+    ... api.received["movies"] / api.stats() ...; api.stop()
+    """
+
+    def __init__(self, stories: list[dict] | None = None, latency: float = 0.0, body_limit: int = 50 << 20,
+                 error_rate: float = 0.0, conflict_rate: float = 0.0, capture: str | None = None, seed: int = 1):
+        self.stories = sorted(stories or [], key=lambda s: (s.get("createdAt") or "", s.get("_id") or ""))
+        self.by_fp = {s.get("fingerprint"): s for s in self.stories}
+        self.latency, self.body_limit = latency, body_limit
+        self.error_rate, self.conflict_rate = error_rate, conflict_rate
+        self.capture = capture
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.received: dict[str, dict[str, dict]] = {c: {} for c in COLLECTIONS.values()}   # upserts by reference_id
+        self.forced: list[int] = []          # statuses returned by the next bulk requests, in order
+        self.counters = {"requests": 0, "bytes": 0, "items": 0, "413": 0, "409": 0, "500": 0}
+        self.server: ThreadingHTTPServer | None = None
+
+    # ---------- control ----------
+    def fail_next(self, *statuses: int) -> None:
+        with self.lock:
+            self.forced.extend(statuses)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "stored": {c: len(v) for c, v in self.received.items()}}
+
+    def start(self, port: int = 0, host: str = "127.0.0.1") -> "LocalAPI":
+        api = self
+
+        class Handler(_Handler):
+            pass
+        Handler.api = api
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    # ---------- routes ----------
+    def list_stories(self, q: dict) -> tuple[int, object]:
+        if "cursor" in q or "since" in q:
+            limit = min(max(int(q.get("limit") or 200), 1), PAGE_MAX)
+            ts, _, sid = (q.get("cursor") or "").partition("|")
+            ts = ts or q.get("since") or ""
+            with self.lock:
+                ordered = sorted(self.stories, key=_revision)
+            items = [s for s in ordered if not ts or _revision(s) > (ts, sid)][:limit]
+            nxt = "|".join(_revision(items[-1])) if len(items) == limit else None
+            return 200, {"items": items, "page": {"nextCursor": nxt}}
+        if "limit" in q or "offset" in q:
+            limit = min(max(int(q.get("limit") or 200), 1), PAGE_MAX)
+            offset = max(int(q.get("offset") or 0), 0)
+            items = self.stories[offset:offset + limit]
+            nxt = offset + limit if offset + limit < len(self.stories) else None
+            return 200, {"items": items, "page": {"nextOffset": nxt}}
+        return 200, list(reversed(self.stories))          # newest first, like Story.find()
+
+    def bulk_stories(self, raw: bytes) -> tuple[int, object]:
+        """
+        Ingest upserts: new fingerprints become stories, existing ones are left alone
+        except `related`, which is mapped from fingerprints to _ids like the backend's
+        linkRelated and bumps updatedAt when it changes.
+        """
+        _, early = self._fault(raw)
+        if early:
+            return early
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            return 400, {"ok": False, "error": str(e)}
+        items = body if isinstance(body, list) else body.get("items") or []
+        upserted = 0
+        with self.lock:
+            now = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            for it in items:
+                fp = it.get("fingerprint")
+                if not fp or fp in self.by_fp:
+                    continue
+                s = {k: v for k, v in it.items() if k != "related"}
+                s.update(_id=f"{len(self.stories):024x}", createdAt=now, updatedAt=now)
+                self.stories.append(s)
+                self.by_fp[fp] = s
+                upserted += 1
+            for it in items:
+                s = self.by_fp.get(it.get("fingerprint"))
+                ids = [self.by_fp[r]["_id"] for r in it.get("related") or [] if r in self.by_fp]
+                if s is not None and ids and s.get("related") != ids:
+                    s.update(related=ids, updatedAt=now)
+            self.counters["items"] += len(items)
+        return 200, {"ok": True, "upserted": upserted, "matched": len(items) - upserted}
+
+    def patch_story_images(self, raw: bytes) -> tuple[int, object]:
+        """PATCH /api/stories/bulk/images: same match keys and `expect` guard as the backend."""
+        _, early = self._fault(raw)
+        if early:
+            return early
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            return 400, {"ok": False, "error": str(e)}
+        items = body if isinstance(body, list) else body.get("items") or []
+        matched = modified = 0
+        with self.lock:
+            for it in items:
+                key = next((k for k in ("canonicalUrl", "fingerprint") if it.get(k)), None)
+                if not key:
+                    continue
+                for s in self.stories:
+                    if s.get(key) != it[key] or ("expect" in it and s.get("image") != it["expect"]):
+                        continue
+                    matched += 1
+                    new = {"image": it.get("image"), "imageStatus": it.get("imageStatus") or "ok"}
+                    if any(s.get(k) != v for k, v in new.items()):
+                        now = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+                        s.update(new, updatedAt=now)
+                        modified += 1
+                    break
+            self.counters["items"] += len(items)
+        return 200, {"ok": True, "matched": matched, "modified": modified}
+
+    def _fault(self, raw: bytes) -> tuple[int | None, tuple | None]:
+        """(forced status, early response) for one bulk request; counts it as well."""
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["bytes"] += len(raw)
+            forced = self.forced.pop(0) if self.forced else None
+            roll = self.rnd.random()
+        if forced is None:
+            if len(raw) > self.body_limit:
+                forced = 413
+            elif roll < self.error_rate:
+                forced = 500
+            elif roll < self.error_rate + self.conflict_rate:
+                forced = 409
+        if forced in (413, 409, 500):
+            with self.lock:
+                self.counters[str(forced)] += 1
+        if forced == 413:
+            return forced, (413, {"error": "request entity too large"})
+        if forced == 500:
+            return forced, (500, {"ok": False, "error": "injected failure"})
+        if forced is not None and forced >= 400 and forced != 409:
+            return forced, (forced, {"ok": False})
+        return forced, None
+
+    def bulk(self, collection: str, raw: bytes) -> tuple[int, object]:
+        forced, early = self._fault(raw)
+        if early:
+            return early
+
+        try:
+            body = json.loads(raw)
+        except ValueError as e:
+            return 400, {"ok": False, "error": str(e)}
+        items = body if isinstance(body, list) else body.get("items") or []
+        upserted = modified = replayed = 0
+        with self.lock:
+            store = self.received[collection]
+            for it in items:
+                ref = it.get("reference_id") if isinstance(it, dict) else None
+                key = ref or f"_anon{len(store)}"
+                if key not in store:
+                    upserted += 1
+                    store[key] = it
+                    continue
+                if it.get("idempotency_key") and store[key].get("idempotency_key") == it["idempotency_key"]:
+                    replayed += 1              # already applied, like the controllers' check
+                    continue
+                # $set of the projected fields; counters and `featured` keep the stored values
+                new = {**it, **{k: store[key][k] for k in SITE_OWNED if k in store[key]}}
+                if new != store[key]:
+                    store[key] = new
+                    modified += 1
+            self.counters["items"] += len(items)
+        if self.capture:
+            with self.lock, open(self.capture, "a", encoding="utf-8") as f:
+                for it in items:
+                    f.write(json.dumps({"collection": collection, "item": it}, ensure_ascii=False) + "\n")
+        if forced == 409:
+            # the real controller answers 409 on a duplicate key after ordered:false
+            # writes went through, so the items are stored either way
+            return 409, {"ok": False, "code": "DUP_KEY", "error": "E11000 duplicate key (injected)"}
+        return 200, {"ok": True, "inserted": 0, "upserted": upserted, "matched": len(items) - upserted,
+                     "modified": modified, "replayed": replayed}
+
+class _Handler(BaseHTTPRequestHandler):
+    api: LocalAPI
+    protocol_version = "HTTP/1.1"            # keep-alive, as the bulk poster pools connections
+
+    def log_message(self, *a):
+        pass
+
+    def _send(self, status: int, obj) -> None:
+        b = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def _body(self) -> bytes:
+        n = self.headers.get("Content-Length")
+        if n is not None:
+            return self.rfile.read(int(n))
+        raw = b""
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                raw += self.rfile.read(size)
+                self.rfile.readline()
+        return raw
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(u.query, keep_blank_values=True).items()}
+        path = u.path.rstrip("/")
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        if path == "/api/stories":
+            return self._send(*self.api.list_stories(q))
+        if path in COLLECTIONS:
+            with self.api.lock:
+                docs = list(self.api.received[COLLECTIONS[path]].values())
+            return self._send(200, docs)
+        if path == "/_stats":
+            return self._send(200, self.api.stats())
+        self._send(404, {"error": "not found"})
+
+    def do_PATCH(self):
+        path = urlparse(self.path).path.rstrip("/")
+        raw = self._body()
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        if path == "/api/stories/bulk/images":
+            return self._send(*self.api.patch_story_images(raw))
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        raw = self._body()
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        if path == "/api/stories/bulk":
+            return self._send(*self.api.bulk_stories(raw))
+        if path.endswith("/bulk") and path[:-5] in COLLECTIONS:
+            return self._send(*self.api.bulk(COLLECTIONS[path[:-5]], raw))
+        self._send(404, {"error": "not found"})
+
+def main():
+    ap = argparse.ArgumentParser(description="local stand-in for the TrendStream API")
+    ap.add_argument("--port", type=int, default=int(os.getenv("LOCAL_API_PORT", "5055")))
+    ap.add_argument("--stories", type=int, default=1000, help="number of synthetic stories to seed")
+    ap.add_argument("--from-file", help="seed from a JSON array of stories instead")
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    ap.add_argument("--body-limit", type=int, default=50 << 20, help="bulk bodies above this get 413")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of bulk requests answered 500")
+    ap.add_argument("--conflict-rate", type=float, default=0.0, help="fraction of bulk requests answered 409")
+    ap.add_argument("--capture", help="append every received item to this NDJSON file")
+    args = ap.parse_args()
+
+    if args.from_file:
+        with open(args.from_file, encoding="utf-8") as f:
+            stories = json.load(f)
+    else:
+        stories = synth_stories(args.stories)
+    api = LocalAPI(stories, args.latency, args.body_limit, args.error_rate, args.conflict_rate, args.capture)
+    api.start(args.port)
+    print(f"local API on {api.base} with {len(stories)} stories (Ctrl-C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+        print(json.dumps(api.stats()))
+
+if __name__ == "__main__":
+    main()
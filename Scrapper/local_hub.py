@@ -0,0 +1,134 @@
+# local_hub.py
+# Minimal stand-in WebSub hub for exercising websub.py locally: accepts
+# (un)subscribe requests, verifies intent against the callback with a challenge,
+# and on publish fetches the topic and delivers it signed (X-Hub-Signature).
+#   python local_hub.py --port 8099
+#   curl -d hub.mode=publish -d hub.url=http://127.0.0.1:8000/feed.xml http://127.0.0.1:8099/
+import os, hmac, time, hashlib, secrets, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlencode
+import requests
+
+class LocalHub:
+    """
+    hub = LocalHub(lease=3600).start(port)
+    feed points at hub.base via <atom:link rel="hub">; hub.publish(topic[, body])
+    """
+
+    def __init__(self, lease: int = 3600, verify: bool = True, algo: str = "sha256"):
+        self.lease, self.verify_intent, self.algo = lease, verify, algo
+        self.lock = threading.Lock()
+        self.subs: dict[tuple[str, str], dict] = {}      # (topic, callback) -> {secret, expires}
+        self.log: list[tuple] = []                        # (event, topic, callback, status)
+        self.server: ThreadingHTTPServer | None = None
+
+    def start(self, port: int = 0, host: str = "127.0.0.1") -> "LocalHub":
+        hub = self
+
+        class Handler(_Handler):
+            pass
+        Handler.hub = hub
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _verify(self, mode: str, topic: str, callback: str, secret: str | None, lease: int) -> None:
+        challenge = secrets.token_hex(8)
+        q = {"hub.mode": mode, "hub.topic": topic, "hub.challenge": challenge}
+        if mode == "subscribe":
+            q["hub.lease_seconds"] = str(lease)
+        sep = "&" if "?" in callback else "?"
+        ok = True
+        if self.verify_intent:
+            try:
+                r = requests.get(callback + sep + urlencode(q), timeout=10)
+                ok = r.status_code // 100 == 2 and r.text == challenge
+            except Exception:
+                ok = False
+        with self.lock:
+            self.log.append((f"verify-{mode}", topic, callback, ok))
+            if not ok:
+                return
+            if mode == "subscribe":
+                self.subs[(topic, callback)] = {"secret": secret, "expires": time.time() + lease}
+            else:
+                self.subs.pop((topic, callback), None)
+
+    def subscribe_request(self, form: dict) -> int:
+        mode, topic, callback = form.get("hub.mode"), form.get("hub.topic"), form.get("hub.callback")
+        if mode not in ("subscribe", "unsubscribe") or not topic or not callback:
+            return 400
+        lease = min(int(form.get("hub.lease_seconds") or self.lease), self.lease)
+        threading.Thread(target=self._verify, args=(mode, topic, callback, form.get("hub.secret"), lease),
+                         daemon=True).start()
+        return 202
+
+    def publish(self, topic: str, body: bytes | None = None, content_type: str = "application/rss+xml") -> int:
+        """Deliver `body` (or the fetched topic) to every live subscriber; returns deliveries."""
+        if body is None:
+            r = requests.get(topic, timeout=15)
+            body, content_type = r.content, r.headers.get("Content-Type", content_type)
+        now = time.time()
+        with self.lock:
+            targets = [(cb, s["secret"]) for (t, cb), s in self.subs.items() if t == topic and s["expires"] > now]
+        sent = 0
+        for cb, secret in targets:
+            headers = {"Content-Type": content_type,
+                       "Link": f'<{self.base}>; rel="hub", <{topic}>; rel="self"'}
+            if secret:
+                sig = hmac.new(secret.encode("utf-8"), body, getattr(hashlib, self.algo)).hexdigest()
+                headers["X-Hub-Signature"] = f"{self.algo}={sig}"
+            try:
+                status = requests.post(cb, data=body, headers=headers, timeout=15).status_code
+            except Exception:
+                status = 0
+            with self.lock:
+                self.log.append(("deliver", topic, cb, status))
+            sent += status // 100 == 2
+        return sent
+
+class _Handler(BaseHTTPRequestHandler):
+    hub: LocalHub
+
+    def log_message(self, *a):
+        pass
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        form = {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+        if form.get("hub.mode") == "publish":
+            topic = form.get("hub.url") or form.get("hub.topic")
+            threading.Thread(target=self.hub.publish, args=(topic,), daemon=True).start()
+            status = 204
+        else:
+            status = self.hub.subscribe_request(form)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+def main():
+    ap = argparse.ArgumentParser(description="local stand-in WebSub hub")
+    ap.add_argument("--port", type=int, default=int(os.getenv("LOCAL_HUB_PORT", "8099")))
+    ap.add_argument("--lease", type=int, default=3600, help="max lease granted, seconds")
+    args = ap.parse_args()
+    hub = LocalHub(args.lease).start(args.port, "0.0.0.0")
+    print(f"local hub on :{args.port} (Ctrl-C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        hub.stop()
+
+if __name__ == "__main__":
+    main()
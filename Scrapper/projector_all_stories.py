@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 import os
-import time
-import json
-import hashlib
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 from urllib.parse import urljoin
 import requests
+import fanout_state
+from json_stream import iter_json_items
+from bulk_poster import BulkPoster
 
 API_BASE = os.getenv("API_BASE", "http://localhost:5000")
 STORIES_ENDPOINT = os.getenv("STORIES_ENDPOINT", "/api/stories")  # GET
@@ -15,85 +15,74 @@ SPORTS_BULK = os.getenv("SPORTS_BULK", "https://trendstream.online/api/api/sport
 
 TIMEOUT = int(os.getenv("TIMEOUT", "30"))
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "100"))
-MIN_BATCH  = int(os.getenv("MIN_BATCH", "10"))
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"   # only stories created or changed since the last run
+STREAM_CHUNK = 64 * 1024
 
 UA = "projector/1.1 (+cron)"
 
-def get_json(url: str, params: Dict[str, Any] | None = None) -> Any:
-    r = requests.get(url, params=params or {}, headers={"User-Agent": UA}, timeout=TIMEOUT)
-    r.raise_for_status()
+def stream_json(url: str, params: Dict[str, Any] | None = None, meta: Dict[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+    """Yield array elements of a JSON response as they arrive (see json_stream)."""
     try:
-        return r.json()
-    except Exception as e:
-        raise RuntimeError(f"Non-JSON at {url}: {r.text[:200]}") from e
+        r = requests.get(url, params=params or {}, headers={"User-Agent": UA}, timeout=TIMEOUT, stream=True)
+        r.raise_for_status()
+    except Exception:
+        try:
+            raw = requests.get(url, params=params or {}, headers={"User-Agent": UA}, timeout=TIMEOUT)
+            print("DEBUG /api/stories:", raw.status_code, raw.text[:200])
+        except Exception as e2:
+            print("DEBUG /api/stories error:", repr(e2))
+        raise
+    with r:
+        try:
+            yield from iter_json_items(r.iter_content(STREAM_CHUNK), meta)
+        except ValueError as e:
+            raise RuntimeError(f"Non-JSON at {url}: {e}") from e
 
-def fetch_all_stories() -> List[Dict[str, Any]]:
+def iter_all_stories() -> Iterator[Dict[str, Any]]:
     url = urljoin(API_BASE, STORIES_ENDPOINT)
     limit = 200
     offset = 0
-    out: List[Dict[str, Any]] = []
+    total = 0
     while True:
-        params = {"limit": limit, "offset": offset}
-        try:
-            data = get_json(url, params=params)
-        except Exception:
-            try:
-                raw = requests.get(url, params=params, headers={"User-Agent": UA}, timeout=TIMEOUT)
-                print("DEBUG /api/stories:", raw.status_code, raw.text[:200])
-            except Exception as e2:
-                print("DEBUG /api/stories error:", repr(e2))
-            raise
-        if isinstance(data, list):
-            out.extend(data); break
-        items = (data or {}).get("items", [])
-        out.extend(items)
-        page = (data or {}).get("page", {})
-        next_offset = page.get("nextOffset")
-        if next_offset is None or not items: break
+        meta: Dict[str, Any] = {}
+        n = 0
+        for s in stream_json(url, {"limit": limit, "offset": offset}, meta):
+            n += 1
+            yield s
+        total += n
+        # a plain array response leaves meta empty -> single page
+        next_offset = (meta.get("page") or {}).get("nextOffset")
+        if next_offset is None or not n: break
         offset = next_offset
-    if not out:
+    if not total:
         try:
             raw = requests.get(url, headers={"User-Agent": UA}, timeout=TIMEOUT)
             print("DEBUG (no params):", raw.status_code, raw.text[:300])
         except Exception as e:
             print("DEBUG fetch error:", repr(e))
-    return out
 
-def idempotency_key(payload: Any) -> str:
-    blob = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
-    return hashlib.sha256(blob).hexdigest()
-
-def post_bulk(endpoint: str, items: List[Dict[str, Any]]):
-    def _send(_items: List[Dict[str, Any]]):
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": UA,
-            "Idempotency-Key": idempotency_key({"items": _items}),
-        }
-        return requests.post((endpoint), json={"items": _items}, headers=headers, timeout=TIMEOUT)
-    
-    n = len(items)
-    if n == 0: return
-    size = min(BATCH_SIZE, n)
-    i = 0
-    while i < n:
-        chunk = items[i : i + size]
-        resp = _send(chunk)
-        if resp.status_code == 413 and size > MIN_BATCH:
-            size = max(MIN_BATCH, size // 2); continue
-        if resp.status_code in (200, 201, 207, 409):
-            print(f"{endpoint}: sent {len(chunk)} -> {resp.status_code}")
-            i += len(chunk); continue
-        if resp.status_code >= 400:
-            print(f"{endpoint}: error {resp.status_code} {resp.text[:300]}")
-            time.sleep(1)
-            resp2 = _send(chunk)
-            if resp2.status_code in (200, 201, 207, 409):
-                print(f"{endpoint}: retry ok ({len(chunk)})")
-                i += len(chunk); continue
-            resp2.raise_for_status()
-        else:
-            i += len(chunk)
+def iter_new_stories(cursor: str | None, progress: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Stories created or changed after `cursor`. progress["cursor"] tracks the newest cursor
+    seen so far, so it is final once the iterator is exhausted.
+    """
+    url = urljoin(API_BASE, STORIES_ENDPOINT)
+    progress["cursor"] = cursor
+    page_cursor = cursor or ""
+    while True:
+        meta: Dict[str, Any] = {}
+        n = 0
+        for s in stream_json(url, {"cursor": page_cursor, "limit": 200}, meta):
+            n += 1
+            if not fanout_state.after(cursor, s):
+                continue        # backend without cursor support returns everything
+            c = fanout_state.story_cursor(s)
+            if c and fanout_state.after(progress["cursor"], s):
+                progress["cursor"] = c
+            yield s
+        next_cursor = (meta.get("page") or {}).get("nextCursor")
+        if not next_cursor or not n: break
+        page_cursor = next_cursor
 
 def split_paragraphs(text_or_array) -> List[str]:
     if not text_or_array: return []
@@ -160,105 +149,108 @@ def allow_for_category(s: Dict[str, Any], label: str) -> bool:
         return False
     return True
 
-def to_movie_item(story: Dict[str, Any]) -> Dict[str, Any]:
+def normalize(story: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields every projection shares, computed once per story and referenced, not copied."""
     return {
         "reference_id": str(story["_id"]),
         "title": story.get("title"),
         "description": story.get("summary"),
         "content": split_paragraphs(story.get("content")),
         "contentImages": story.get("contentImages") or [],
-        "images": story.get("images") or [],
-        "thumbnail": get_story_image(story),
+        "imageVariants": story.get("imageVariants"),
         "author": story.get("author"),
         "date": story.get("publishedAt"),
         "readTime": story.get("readTime"),
-        "category": "Review" if "review" in (story.get("tags") or []) else "News",
         "tags": story.get("tags") or [],
+        "related": [str(r) for r in story.get("related") or []],   # story _ids = reference_ids
         "featured": bool(story.get("featured", False)),
+    }
+
+def to_movie_item(story: Dict[str, Any], base: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    base = base or normalize(story)
+    return {
+        **base,
+        "images": story.get("images") or [],
+        "thumbnail": get_story_image(story),
+        "category": "Review" if "review" in base["tags"] else "News",
         "genre": story.get("genre"),
         "type": story.get("type") or "Movie",
     }
 
-def to_blog_item(story: Dict[str, Any]) -> Dict[str, Any]:
+def to_blog_item(story: Dict[str, Any], base: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    base = base or normalize(story)
     return {
-        "reference_id": str(story["_id"]),
-        "title": story.get("title"),
-        "description": story.get("summary"),
-        "content": split_paragraphs(story.get("content")),
-        "contentImages": story.get("contentImages") or [],
+        **base,
         "image": get_story_image(story),
-        "author": story.get("author"),
-        "date": story.get("publishedAt"),
-        "readTime": story.get("readTime"),
         "category": story.get("category") or "Blog",
-        "tags": story.get("tags") or [],
         "comments": 0,
-        "featured": bool(story.get("featured", False)),
         "type": story.get("type") or "Blog",
     }
 
-def to_sport_item(story: Dict[str, Any]) -> Dict[str, Any]:
+def to_sport_item(story: Dict[str, Any], base: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    base = base or normalize(story)
     return {
-        "reference_id": str(story["_id"]),
-        "title": story.get("title"),
-        "description": story.get("summary"),
-        "content": split_paragraphs(story.get("content")),
-        "contentImages": story.get("contentImages") or [],
+        **base,
         "images": story.get("images") or [],
         "thumbnail": get_story_image(story),
-        "author": story.get("author"),
-        "date": story.get("publishedAt"),
-        "readTime": story.get("readTime"),
         "category": story.get("category") or "News",
-        "tags": story.get("tags") or [],
-        "featured": bool(story.get("featured", False)),
         "sport": story.get("sport"),
         "type": story.get("type") or "News",
     }
 
-def main():
-    stories = fetch_all_stories()
-    print(f"fetched {len(stories)} stories")
+PROJECTIONS = {"movies": to_movie_item, "blogs": to_blog_item, "sports": to_sport_item}
 
-    movies_payload: List[Dict[str, Any]] = []
-    blogs_payload: List[Dict[str, Any]]  = []
-    sports_payload: List[Dict[str, Any]] = []
+def main():
+    cursor = None
+    progress: Dict[str, Any] = {}
+    if INCREMENTAL:
+        cursor = fanout_state.load_cursor("projector_all_stories")
+        stories = iter_new_stories(cursor, progress)
+        print(f"incremental since {cursor or 'start'}")
+    else:
+        stories = iter_all_stories()
 
+    poster = BulkPoster(API_BASE, {"movies": MOVIES_BULK, "blogs": BLOGS_BULK, "sports": SPORTS_BULK},
+                        UA, TIMEOUT, BATCH_SIZE)
+    counts = {"movies":0, "blogs":0, "sports":0}
     skipped = {"movies":0, "blogs":0, "sports":0, "unlabeled":0}
+    fetched = 0
 
+    # classify + project each story as it streams in; the three endpoints are fed
+    # concurrently and memory stays bounded by the in-flight chunks
     for s in stories:
+        fetched += 1
         labels = classify(s)
         if not labels:
             skipped["unlabeled"] += 1
             continue
+        base = None
+        for label in ("movies", "blogs", "sports"):
+            if label not in labels:
+                continue
+            if allow_for_category(s, label):
+                base = base or normalize(s)
+                poster.add(label, PROJECTIONS[label](s, base))
+                counts[label] += 1
+            else:
+                skipped[label] += 1
 
-        if "movies" in labels and allow_for_category(s, "movies"):
-            movies_payload.append(to_movie_item(s))
-        elif "movies" in labels:
-            skipped["movies"] += 1
-
-        if "blogs" in labels and allow_for_category(s, "blogs"):
-            blogs_payload.append(to_blog_item(s))
-        elif "blogs" in labels:
-            skipped["blogs"] += 1
-
-        if "sports" in labels and allow_for_category(s, "sports"):
-            sports_payload.append(to_sport_item(s))
-        elif "sports" in labels:
-            skipped["sports"] += 1
-
-    if movies_payload:
-        post_bulk(MOVIES_BULK, movies_payload)
-    if blogs_payload:
-        post_bulk(BLOGS_BULK, blogs_payload)
-    if sports_payload:
-        post_bulk(SPORTS_BULK, sports_payload)
+    stats = poster.close()
 
+    print(f"fetched {fetched} stories")
     print("done:",
-          f"{len(movies_payload)} movies,",
-          f"{len(blogs_payload)} blogs,",
-          f"{len(sports_payload)} sports")
+          f"{counts['movies']} movies,",
+          f"{counts['blogs']} blogs,",
+          f"{counts['sports']} sports")
     print("skipped:", skipped)
+    for label, st in stats.items():
+        print(f"{label}: {st['new']} new, {st['changed']} changed, {st['unchanged']} unchanged (skipped), "
+              f"{st['items']} sent in {st['requests']} req / {st['bytes']} B")
+
+    # only advance once every bulk post went through (poster.close() raises otherwise)
+    new_cursor = progress.get("cursor")
+    if INCREMENTAL and new_cursor and new_cursor != cursor:
+        fanout_state.save_cursor("projector_all_stories", new_cursor)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+# related_index.py
+# Related stories at ingest time: an inverted index tag -> story fingerprints over
+# the CUTOFF_DAYS window (.cache/related_index.json). Each new story is scored
+# against the stories sharing its tags (IDF-weighted overlap, normalized by tag
+# counts, small same-category boost) and gets its top-k fingerprints as `related`;
+# the API stores them as story _ids and the fanout projects them to the collections.
+import os, json, math, time, threading
+from collections import Counter
+from datetime import datetime, timezone
+import file_lock
+
+INDEX_PATH     = os.getenv("RELATED_INDEX_PATH", ".cache/related_index.json")
+CUTOFF_DAYS    = int(os.getenv("CUTOFF_DAYS", "5"))
+RELATED_K      = int(os.getenv("RELATED_K", "6"))
+MIN_SCORE      = float(os.getenv("RELATED_MIN_SCORE", "0.15"))
+MAX_POSTING    = int(os.getenv("RELATED_MAX_POSTING", "2000"))   # skip tags on more stories than this
+CATEGORY_BOOST = 1.2
+
+_lock = threading.Lock()
+_stories: dict[str, dict] | None = None        # fingerprint -> {"tags", "cat", "at"}
+_postings: dict[str, set[str]] = {}            # tag -> fingerprints
+_new: dict[str, dict] = {}                     # added since the last save, merged into the file
+
+def _epoch(iso: str | None) -> float:
+    if iso:
+        try:
+            dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+def _add(fp: str, rec: dict) -> None:
+    _stories[fp] = rec
+    for t in rec["tags"]:
+        _postings.setdefault(t, set()).add(fp)
+
+def _drop(fp: str) -> None:
+    rec = _stories.pop(fp, None)
+    for t in (rec or {}).get("tags", ()):
+        s = _postings.get(t)
+        if s is not None:
+            s.discard(fp)
+            if not s:
+                del _postings[t]
+
+def _expire() -> None:
+    horizon = time.time() - CUTOFF_DAYS * 86400
+    for fp in [fp for fp, r in _stories.items() if r["at"] < horizon]:
+        _drop(fp)
+
+def _read() -> dict:
+    try:
+        with open(INDEX_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _rebuild(stories: dict) -> None:
+    global _stories, _postings
+    _stories, _postings = {}, {}
+    for fp, rec in stories.items():
+        _add(fp, rec)
+    _expire()
+
+def _load() -> dict:
+    if _stories is None:
+        _rebuild(_read())
+    return _stories
+
+def _related(fp: str, tags: list[str], cat: str | None) -> list[str]:
+    n = len(_stories) + 1
+    scores: Counter = Counter()
+    for t in tags:
+        posting = _postings.get(t)
+        if not posting or len(posting) > MAX_POSTING:
+            continue
+        w = math.log(1 + n / len(posting))
+        for other in posting:
+            if other != fp:
+                scores[other] += w
+    out = []
+    for other, s in scores.items():
+        rec = _stories[other]
+        s /= math.sqrt(len(tags) * len(rec["tags"]))
+        if cat and rec.get("cat") == cat:
+            s *= CATEGORY_BOOST
+        if s >= MIN_SCORE:
+            out.append((s, rec["at"], other))
+    out.sort(reverse=True)                     # best overlap first, newer on ties
+    return [other for _, _, other in out[:RELATED_K]]
+
+def annotate(items: list[dict]) -> None:
+    """Set `related` (top-k fingerprints) on each story and add the stories to the index."""
+    with _lock:
+        _load()
+        for it in items:
+            fp = it.get("fingerprint")
+            tags = [t.lower() for t in (it.get("tags") or []) if t]
+            if not fp or not tags:
+                it["related"] = []
+                continue
+            it["related"] = _related(fp, tags, it.get("category"))
+            if fp not in _stories:
+                rec = {"tags": tags, "cat": it.get("category"), "at": _epoch(it.get("publishedAt"))}
+                _add(fp, rec)
+                _new[fp] = rec
+
+def save() -> None:
+    """
+    Merge the stories added here into the file and reload from the result. The
+    cron ingest and websub.py both annotate, so the file is re-read under a lock
+    instead of overwritten, and each picks up the other's stories on save.
+    """
+    with _lock:
+        if not _new:
+            return
+        with file_lock.locked(INDEX_PATH + ".lock"):
+            merged = _read()
+            merged.update(_new)
+            _rebuild(merged)
+            tmp = INDEX_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_stories, f, separators=(",", ":"))
+            os.replace(tmp, INDEX_PATH)
+        _new.clear()
@@ -1,12 +1,9 @@
 # ingest_rss.py
-import os, re, time, requests, feedparser, hashlib
+# parsers and the image helpers are imported where they are used (see ingest_feeds_enhanced.py)
+import os, re, time, requests, hashlib
 from datetime import datetime, timedelta, timezone
-from dateutil import parser as dateparse
-from PyPDF2 import PdfReader
-from bs4 import BeautifulSoup, NavigableString
-from readability import Document
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
-from image_resolver import resolve_best_image
+import image_cache, charsets, singleflight
 
 API_URL = os.getenv("API_URL", "http://localhost:5000/api/stories/bulk")
 PDF_PATH = os.getenv("RSS_PDF", "rss-urls-1.pdf")
@@ -19,6 +16,7 @@ REQUEST_TIMEOUT = 60
 PAGE_TIMEOUT = 10
 MIN_WORDS = 120
 SLEEP_BETWEEN_FEEDS = 0.2
+IMAGE_MODE = os.getenv("IMAGE_MODE", "deferred")   # deferred: post now, validate in image_queue.py | inline
 # ---------------------------
 
 UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -62,6 +60,7 @@ def make_fingerprint(source: str, guid: str, title: str, published_iso: str, can
 
 # --------- feed list helpers ---------
 def extract_urls_from_pdf(pdf_path: str) -> list[str]:
+    from PyPDF2 import PdfReader
     reader = PdfReader(pdf_path)
     text = "\n".join((page.extract_text() or "") for page in reader.pages)
     urls = URL_RE.findall(text)
@@ -90,6 +89,7 @@ def normalize_ws(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").strip())
 
 def html_to_text(html: str) -> str:
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html or "", "lxml")
     for t in soup(["script","style","noscript"]): t.extract()
     text = soup.get_text(separator=" ")
@@ -105,6 +105,7 @@ def extract_paragraphs_from_html(content_html: str) -> list[str]:
     if not content_html:
         return []
 
+    from bs4 import BeautifulSoup, NavigableString
     soup = BeautifulSoup(content_html, "lxml")
 
     # Remove obvious junk containers commonly injected in article bodies
@@ -199,11 +200,23 @@ def split_paragraphs_plain(text: str | None) -> list[str]:
         parts = out or parts
     return parts
 
+# duplicate links (same story in several feeds, or page + image lookup) share one fetch
+PAGE_MEMO = int(os.getenv("PAGE_MEMO", "64"))
+_pages    = singleflight.Group("pages", PAGE_MEMO)
+_fulltext = singleflight.Group("fulltext", PAGE_MEMO)
+_heads    = singleflight.Group("heads")
+
+def _page_key(url: str) -> str:
+    return canonicalize_url(url) or url
+
 def fetch_page(url: str) -> str | None:
+    return _pages.do(_page_key(url), lambda: _fetch_page(url))
+
+def _fetch_page(url: str) -> str | None:
     try:
         r = requests.get(url, headers={"User-Agent": UA}, timeout=PAGE_TIMEOUT)
         r.raise_for_status()
-        return r.text
+        return charsets.decode(*charsets.response_body(r))
     except Exception:
         return None
 
@@ -211,10 +224,14 @@ def fetch_fulltext_artifact(url: str) -> tuple[str | None, str | None, str | Non
     """
     Returns: (plain_text_from_readability, full_html, readability_content_html)
     """
+    return _fulltext.do(_page_key(url), lambda: _fulltext_artifact(url))
+
+def _fulltext_artifact(url: str) -> tuple[str | None, str | None, str | None]:
     html = fetch_page(url)
     if not html:
         return None, None, None
     try:
+        from readability import Document
         doc = Document(html)
         content_html = doc.summary(html_partial=True)
         text = html_to_text(content_html)
@@ -222,6 +239,28 @@ def fetch_fulltext_artifact(url: str) -> tuple[str | None, str | None, str | Non
     except Exception:
         return None, html, None
 
+def lookup_image(link: str, strict: bool = False) -> str | None:
+    """
+    og:image / JSON-LD from the streamed <head>; on a miss the same response is read
+    on for the in-article <img> fallback, so a miss costs one request, not two.
+    With `strict` (image_queue), raises ProbeFailed when the page or a candidate
+    probe failed, rather than returning None as if the page had no image.
+    """
+    from image_resolver import resolve_best_image, resolve_from_head, ProbeFailed
+    from head_fetch import HeadStream
+    with HeadStream(link, UA, PAGE_TIMEOUT) as hs:
+        image = resolve_from_head(hs.head, link, UA, strict) if hs.head else None
+        if image:
+            return image
+        page = hs.rest()
+        failed = hs.failed
+    if strict and failed:
+        raise ProbeFailed(f"page {link} could not be read")
+    if not page:
+        return None
+    body, encoding = page
+    return resolve_best_image(body, link, UA, encoding, strict)   # lxml parses the bytes, no decode pass
+
 def best_entry_html(entry) -> str | None:
     """
     Try to get embedded fulltext HTML from the feed item itself.
@@ -240,6 +279,7 @@ def best_entry_text(entry) -> str:
     return html_to_text(val) if val else ""
 
 def parse_date(entry):
+    from dateutil import parser as dateparse
     for key in ("published", "updated", "created"):
         val = getattr(entry, key, None) or entry.get(key)
         if val:
@@ -293,11 +333,17 @@ def clean_entry(feed, entry, category):
             image = entry.media_thumbnail[0].get("url")
     except Exception:
         pass
-    if not image:
-        if not html_cache:
-            html_cache = fetch_page(link)
-        if html_cache:
-            image = resolve_best_image(html_cache, link, UA)
+    image_job = None
+    if not image and IMAGE_MODE == "deferred":
+        # post with the best unvalidated candidate; image_queue.py probes and patches it later
+        from image_resolver import candidate_urls
+        image_job = candidate_urls(html_cache, link) if html_cache else []
+        image = image_job[0] if image_job else None
+    elif not image and html_cache:
+        from image_resolver import resolve_best_image
+        image = resolve_best_image(html_cache, link, UA)
+    elif not image:
+        image = _heads.do(_page_key(link), lambda: lookup_image(link))
 
     source = (feed.feed.get("title") or feed.feed.get("link") or "").strip()
     guid = entry.get("id") or entry.get("guid")
@@ -316,7 +362,7 @@ def clean_entry(feed, entry, category):
         capped.append(p)
         total_words += len(p.split())
 
-    return {
+    story = {
         "title": title[:250],
         "link": link.strip(),
         "canonicalUrl": canonical_url,
@@ -330,8 +376,13 @@ def clean_entry(feed, entry, category):
         "tags": [],
         "publishedAt": published_iso,
     }
+    if image_job is not None:
+        story["imageStatus"] = "pending"
+        story["_image_job"] = image_job      # enqueued once the story is stored (post_batch)
+    return story
 
 def post_batch(items_batch):
+    jobs = [(it, it.pop("_image_job")) for it in items_batch if "_image_job" in it]
     try:
         resp = requests.post(API_URL, json={"items": items_batch}, timeout=REQUEST_TIMEOUT)
         print("Posted batch:", len(items_batch), resp.status_code)
@@ -339,8 +390,15 @@ def post_batch(items_batch):
             print(resp.text[:500])
     except Exception as e:
         print("POST error:", e)
+        return
+    if jobs and (resp.status_code < 400 or resp.status_code == 409):
+        import image_queue
+        for story, candidates in jobs:
+            image_queue.enqueue(story, candidates)
 
 def main():
+    import feedparser
+    from dateutil import parser as dateparse
     urls = extract_urls_from_pdf(PDF_PATH)
     selected = []
     for u in urls:
@@ -398,6 +456,12 @@ def main():
 
     if batch:
         post_batch(batch)
+    image_cache.report()
+    if IMAGE_MODE == "deferred":
+        import image_queue
+        print("Image queue backlog:", image_queue.backlog())
+    for g in (_pages, _fulltext, _heads):
+        g.report()
     print("Done.")
 
 if __name__ == "__main__":
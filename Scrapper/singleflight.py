@@ -0,0 +1,97 @@
+# singleflight.py
+# In-run request coalescing: Group.do(key, fn) runs fn once per key; callers that
+# ask for the same key while it is in flight wait for that call, and later callers
+# get its (memoized) result. Keys are canonical URLs, so the same article reached
+# through several feeds, or fetched twice by one story, is downloaded and parsed once.
+import os, threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+SINGLEFLIGHT_MAX = int(os.getenv("SINGLEFLIGHT_MAX", "256"))     # memoized results kept per group
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+def url_key(url: str) -> str:
+    """Scheme/host lowercased, default port and fragment dropped; path and query kept as-is."""
+    try:
+        u = urlsplit(url.strip())
+        scheme = u.scheme.lower()
+        host = (u.hostname or "").lower()
+        if u.port and str(u.port) != _DEFAULT_PORTS.get(scheme):
+            host += f":{u.port}"
+        return urlunsplit((scheme, host, u.path or "/", u.query, ""))
+    except Exception:
+        return url
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class Group:
+    """
+    pages = Group("pages", max_entries=64)
+    html = pages.do(canonical_url, lambda: fetch(url))
+
+    Exceptions are handed to every waiter of that call but not memoized, so the
+    next caller retries. forget(key) drops a memoized result.
+    """
+
+    def __init__(self, name: str, max_entries: int = SINGLEFLIGHT_MAX):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _Call] = {}
+        self._done: OrderedDict[str, object] = OrderedDict()
+        self._stats = {"calls": 0, "memo": 0, "shared": 0}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            if key in self._done:
+                self._done.move_to_end(key)
+                self._stats["memo"] += 1
+                return self._done[key]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self._stats["calls"] += 1
+            else:
+                self._stats["shared"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and self.max_entries > 0:
+                    self._done[key] = call.value
+                    while len(self._done) > self.max_entries:
+                        self._done.popitem(last=False)
+            call.done.set()
+        return call.value
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._done.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def report(self) -> None:
+        s = self.stats()
+        saved = s["memo"] + s["shared"]
+        if saved:
+            print(f"singleflight[{self.name}]: {s['calls']} fetches, {saved} duplicate requests coalesced "
+                  f"({s['shared']} in flight, {s['memo']} memoized)")
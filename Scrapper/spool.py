@@ -0,0 +1,259 @@
+# spool.py
+# Durable local spool between extraction and the API: the ingest appends stories
+# to segment-rotated NDJSON files (fsync batched), and a separate drainer uploads
+# sealed segments to /api/stories/bulk, checkpointing the acknowledged byte offset
+# and deleting each segment once all of it went through.
+#   SINK=spool python ingest_feeds_enhanced.py      # writer
+#   python spool.py drain                           # uploader (loops; --once to exit when empty)
+import os, json, time, glob, argparse
+import file_lock
+
+SPOOL_DIR      = os.getenv("SPOOL_DIR", ".cache/spool")
+SEGMENT_BYTES  = int(os.getenv("SPOOL_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+SEGMENT_SECS   = float(os.getenv("SPOOL_SEGMENT_SECS", "60"))    # long-running writers seal this often (websub also when idle)
+FSYNC_EVERY    = int(os.getenv("SPOOL_FSYNC_EVERY", "200"))       # records between fsyncs
+FSYNC_SECS     = float(os.getenv("SPOOL_FSYNC_SECS", "1.0"))     # ... or this long, whichever first
+DRAIN_BATCH    = int(os.getenv("SPOOL_DRAIN_BATCH", "100"))
+DRAIN_BYTES    = int(os.getenv("SPOOL_DRAIN_BYTES", str(4 * 1024 * 1024)))
+DRAIN_INTERVAL = float(os.getenv("SPOOL_DRAIN_INTERVAL", "5"))
+API_URL        = os.getenv("API_URL", "http://localhost:5000/api/stories/bulk")
+TIMEOUT        = int(os.getenv("REQUEST_TIMEOUT", "60"))
+STALE_LOCK_SECS = 600                       # a lock without a segment this old is a crashed writer's
+
+OPEN, SEALED, CKPT, LOCK = ".ndjson.open", ".ndjson", ".ckpt", ".lock"
+
+def _fsync_dir(path: str) -> None:
+    if os.name == "nt":
+        return                             # directories can't be opened for fsync on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:                        # gone already, or still open elsewhere (Windows)
+        pass
+
+class Spool:
+    """
+    Append-only writer. One open segment per process; its <segment>.lock sidecar
+    stays locked while it is written. The lock sits beside the segment rather than
+    on it because Windows cannot rename a file that is still open.
+    """
+
+    def __init__(self, directory: str = SPOOL_DIR):
+        self.dir = directory
+        os.makedirs(self.dir, exist_ok=True)
+        self.f = None
+        self.lockf = None
+        self.path = None
+        self.opened = 0.0
+        self.size = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.stats = {"records": 0, "bytes": 0, "segments": 0, "fsyncs": 0}
+
+    def _open(self) -> None:
+        name = os.path.join(self.dir, f"seg-{time.time_ns():020d}-{os.getpid()}")
+        # lock before the segment exists, so recover_abandoned never sees it unlocked
+        self.lockf = open(name + LOCK, "a+b")
+        file_lock.lock(self.lockf)
+        self.path = name + OPEN
+        self.f = open(self.path, "ab")
+        self.opened = time.monotonic()
+        self.size = 0
+        self.stats["segments"] += 1
+
+    def append(self, items: list[dict]) -> None:
+        for it in items:
+            line = json.dumps(it, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            if self.f is None:
+                self._open()
+            self.f.write(line)
+            self.size += len(line)
+            self.unsynced += 1
+            self.stats["records"] += 1
+            self.stats["bytes"] += len(line)
+            if self.size >= SEGMENT_BYTES:
+                self.seal()
+        if self.f is not None and time.monotonic() - self.opened >= SEGMENT_SECS:
+            self.seal()
+        if self.unsynced >= FSYNC_EVERY or time.monotonic() - self.last_sync >= FSYNC_SECS:
+            self.sync()
+
+    def sync(self) -> None:
+        if self.f is not None and self.unsynced:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.stats["fsyncs"] += 1
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def seal(self) -> None:
+        """Close the open segment and hand it to the drainer."""
+        if self.f is None:
+            return
+        self.unsynced = max(self.unsynced, 1)
+        self.sync()
+        self.f.close()                     # before the rename, for Windows; still locked
+        os.rename(self.path, self.path[:-len(OPEN)] + SEALED)
+        _fsync_dir(self.dir)
+        file_lock.unlock(self.lockf)
+        self.lockf.close()
+        _remove(self.path[:-len(OPEN)] + LOCK)
+        self.f = self.lockf = self.path = None
+
+    def close(self) -> None:
+        self.seal()
+
+# ---------- drainer ----------
+def _read_ckpt(seg: str) -> int:
+    try:
+        with open(seg + CKPT, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except Exception:
+        return 0
+
+def _write_ckpt(seg: str, offset: int) -> None:
+    tmp = seg + CKPT + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, seg + CKPT)
+
+def _seal_abandoned(path: str) -> bool:
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return False                       # its writer sealed it meanwhile
+    with f:
+        data = f.read()
+        keep = data.rfind(b"\n") + 1
+        if keep < len(data):
+            f.truncate(keep)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(path, path[:-len(OPEN)] + SEALED)
+    return True
+
+def recover_abandoned(directory: str = SPOOL_DIR) -> int:
+    """
+    Seal open segments whose writer is gone (its lock is free), dropping a torn
+    last line, and clear leftover locks. Returns how many segments were recovered.
+    A lock with no segment is only cleared once stale: a new writer creates it a
+    moment before locking it, and removing it then would leave that writer
+    holding a lock on a file nobody else can see.
+    """
+    n = 0
+    opened = {p[:-len(OPEN)] for p in glob.glob(os.path.join(directory, "*" + OPEN))}
+    locks = {p[:-len(LOCK)] for p in glob.glob(os.path.join(directory, "*" + LOCK))}
+    for base in sorted(opened | locks):
+        if base not in opened:
+            try:
+                if time.time() - os.path.getmtime(base + LOCK) < STALE_LOCK_SECS:
+                    continue
+            except OSError:
+                continue                   # removed meanwhile
+        with open(base + LOCK, "a+b") as lf:
+            if not file_lock.try_lock(lf):
+                continue                   # a live writer holds it
+            try:
+                if base in opened and _seal_abandoned(base + OPEN):
+                    n += 1
+            finally:
+                file_lock.unlock(lf)
+        _remove(base + LOCK)
+    if n:
+        _fsync_dir(directory)
+    return n
+
+def _batches(f, start: int):
+    """(records, end offset) batches from byte `start`, bounded by DRAIN_BATCH / DRAIN_BYTES."""
+    f.seek(start)
+    batch, size, pos = [], 0, start
+    for line in f:
+        pos += len(line)
+        if line.strip():
+            try:
+                batch.append(json.loads(line))
+                size += len(line)
+            except ValueError:
+                print(f"spool: skipping corrupt record at {pos - len(line)}")
+        if len(batch) >= DRAIN_BATCH or size >= DRAIN_BYTES:
+            yield batch, pos
+            batch, size = [], 0
+    if batch or pos > start:
+        yield batch, pos
+
+def default_upload(items: list[dict]) -> bool:
+    import requests
+    try:
+        r = requests.post(API_URL, json={"items": items}, timeout=TIMEOUT)
+    except Exception as e:
+        print("spool: POST error:", e)
+        return False
+    if r.status_code >= 400 and r.status_code != 409:     # 409: duplicates, already stored
+        print(f"spool: POST {r.status_code} {r.text[:300]}")
+        return False
+    return True
+
+def drain_once(upload=default_upload, directory: str = SPOOL_DIR) -> dict:
+    """Upload every sealed segment; stops at the first failed batch (kept for the next pass)."""
+    stats = {"segments": 0, "records": 0, "failed": False}
+    recover_abandoned(directory)
+    for seg in sorted(glob.glob(os.path.join(directory, "*" + SEALED))):
+        offset = _read_ckpt(seg)
+        with open(seg, "rb") as f:
+            for items, end in _batches(f, offset):
+                if items and not upload(items):
+                    stats["failed"] = True
+                    return stats
+                _write_ckpt(seg, end)
+                stats["records"] += len(items)
+        os.remove(seg)
+        try:
+            os.remove(seg + CKPT)
+        except FileNotFoundError:
+            pass
+        stats["segments"] += 1
+    return stats
+
+def backlog(directory: str = SPOOL_DIR) -> dict:
+    segs = glob.glob(os.path.join(directory, "*" + SEALED))
+    opened = glob.glob(os.path.join(directory, "*" + OPEN))
+    pending = sum(max(0, os.path.getsize(s) - _read_ckpt(s)) for s in segs)
+    return {"sealed": len(segs), "open": len(opened), "pending_bytes": pending}
+
+def drain(interval: float = DRAIN_INTERVAL, once: bool = False, upload=default_upload) -> bool:
+    """Loop forever (or one pass with once=True; returns False if that pass failed)."""
+    delay = interval
+    while True:
+        st = drain_once(upload)
+        if st["records"] or st["failed"]:
+            print(f"spool: uploaded {st['records']} records, {st['segments']} segments done"
+                  + (" (upload failing, will retry)" if st["failed"] else ""))
+        if once:
+            return not st["failed"]
+        # back off while the API is failing, up to 2 minutes
+        delay = min(delay * 2, 120) if st["failed"] else interval
+        time.sleep(delay)
+
+def main():
+    ap = argparse.ArgumentParser(description="drain the ingest spool into the API")
+    ap.add_argument("cmd", choices=["drain", "stats"])
+    ap.add_argument("--once", action="store_true", help="one pass over the sealed segments, then exit")
+    ap.add_argument("--interval", type=float, default=DRAIN_INTERVAL)
+    args = ap.parse_args()
+    if args.cmd == "stats":
+        print(json.dumps(backlog()))
+        return
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    if not drain(args.interval, args.once):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# strategy_stats.py
+# Per-domain record of which extraction strategy clears MIN_WORDS and how long it takes,
+# persisted across runs so each publisher gets its historically best strategy first.
+# Only the page strategies are ranked: the score is successes per second, which the
+# near-free feed-summary fallback would always win, so ingest keeps it last.
+import os, json, random, threading
+from urllib.parse import urlparse
+import file_lock
+
+STATS_PATH   = os.getenv("STRATEGY_STATS_PATH", ".cache/strategy_stats.json")
+EXPLORE_RATE = float(os.getenv("STRATEGY_EXPLORE", "0.1"))   # chance of a random order (re-exploration)
+DECAY        = 0.9                                            # older outcomes fade out
+
+_lock = threading.Lock()
+_stats: dict[str, dict[str, dict]] | None = None
+_pending: list[tuple] = []      # outcomes recorded since the last save, replayed onto the file
+
+def domain_of(url: str) -> str:
+    host = (urlparse(url or "").netloc or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _read() -> dict:
+    try:
+        with open(STATS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _load() -> dict:
+    global _stats
+    if _stats is None:
+        _stats = _read()
+    return _stats
+
+def _apply(stats: dict, domain: str, strategy: str, ok: bool, seconds: float) -> None:
+    rec = stats.setdefault(domain, {}).setdefault(strategy, {"tries": 0.0, "wins": 0.0, "secs": 0.0})
+    rec["tries"] = rec["tries"] * DECAY + 1
+    rec["wins"]  = rec["wins"] * DECAY + (1 if ok else 0)
+    rec["secs"]  = rec["secs"] * DECAY + seconds
+
+def _score(rec: dict | None) -> float:
+    # expected successes per second; smoothed so one lucky try doesn't dominate
+    if not rec:
+        return -1.0
+    rate = (rec["wins"] + 1) / (rec["tries"] + 2)
+    avg = rec["secs"] / rec["tries"] if rec["tries"] else 1.0
+    return rate / max(avg, 0.05)
+
+def order(domain: str, strategies: list[str]) -> list[str]:
+    """Strategies for this domain, best first; unknown ones keep their default position."""
+    with _lock:
+        recs = _load().get(domain) or {}
+        if not recs:
+            return list(strategies)
+        if random.random() < EXPLORE_RATE:
+            return random.sample(strategies, len(strategies))
+        known = sorted((s for s in strategies if s in recs), key=lambda s: _score(recs[s]), reverse=True)
+        return known + [s for s in strategies if s not in recs]
+
+def record(domain: str, strategy: str, ok: bool, seconds: float) -> None:
+    with _lock:
+        _apply(_load(), domain, strategy, ok, seconds)
+        _pending.append((domain, strategy, ok, seconds))
+
+def save() -> None:
+    """
+    Merge this process's outcomes into the file. The cron ingest and websub.py
+    both record, so the file is re-read under a lock and the new outcomes are
+    replayed onto it rather than overwriting it with this process's copy.
+    """
+    global _stats
+    with _lock:
+        if not _pending:
+            return
+        with file_lock.locked(STATS_PATH + ".lock"):
+            stats = _read()
+            for op in _pending:
+                _apply(stats, *op)
+            tmp = STATS_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(stats, f, separators=(",", ":"))
+            os.replace(tmp, STATS_PATH)
+        _stats = stats
+        _pending.clear()
@@ -0,0 +1,324 @@
+# websub.py
+# WebSub (PubSubHubbub) push receiver: feeds that advertise a hub get their new
+# entries pushed instead of waiting for the next polling run. Hubs are recorded
+# while the ingest parses feeds (WEBSUB=1); this module subscribes to them,
+# renews leases, answers verification challenges, checks X-Hub-Signature and
+# runs pushed entries through ingest's clean_one -> post_batch.
+#   WEBSUB_CALLBACK=https://scraper.example.com python websub.py --port 8088
+import os, re, hmac, json, time, queue, hashlib, secrets, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from contextlib import contextmanager
+import requests
+import file_lock
+
+STATE_PATH     = os.getenv("WEBSUB_STATE", ".cache/websub.json")
+CALLBACK_BASE  = os.getenv("WEBSUB_CALLBACK", "http://localhost:8088")   # public base URL of this receiver
+LEASE_SECONDS  = int(os.getenv("WEBSUB_LEASE", str(5 * 24 * 3600)))      # requested lease
+RENEW_BEFORE   = int(os.getenv("WEBSUB_RENEW_BEFORE", str(12 * 3600)))   # renew when less than this is left
+RETRY_SECONDS  = int(os.getenv("WEBSUB_RETRY", "3600"))                  # after a refused/failed subscribe
+FLUSH_SECONDS  = float(os.getenv("WEBSUB_FLUSH", "5"))                   # post a partial batch after this idle time
+MAX_PUSH_BYTES = 5_000_000
+HUB_TIMEOUT    = 15
+
+LINK_HEADER_RE = re.compile(r'<([^>]+)>\s*;\s*rel="?([^";]+)"?', re.I)
+SIG_ALGOS = {"sha1": hashlib.sha1, "sha256": hashlib.sha256, "sha384": hashlib.sha384, "sha512": hashlib.sha512}
+
+_lock = threading.Lock()
+
+# The cron ingest (note_feed) and the receiver both write the file, so every
+# change re-reads it under a file lock instead of trusting a cached copy.
+def _read() -> dict:
+    """callback id -> subscription, as on disk now."""
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _write(subs: dict) -> None:
+    d = os.path.dirname(STATE_PATH)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(subs, f, indent=1)
+    os.replace(tmp, STATE_PATH)
+
+@contextmanager
+def _state():
+    """with _state() as subs: mutate; written back on exit if anything changed."""
+    with _lock, file_lock.locked(STATE_PATH + ".lock"):
+        subs = _read()
+        before = json.dumps(subs, sort_keys=True)
+        yield subs
+        if json.dumps(subs, sort_keys=True) != before:
+            _write(subs)
+
+def callback_id(topic: str) -> str:
+    return hashlib.sha1(topic.encode("utf-8")).hexdigest()[:16]
+
+# ---------- discovery (called from the polling ingest) ----------
+def discover(feed, link_header: str | None = None) -> tuple[str | None, str | None]:
+    """(hub, self/topic URL) from <link rel="hub"/"self"> in the feed or the HTTP Link header."""
+    hub = topic = None
+    for l in (feed.feed.get("links") or []):
+        rel, href = l.get("rel"), l.get("href")
+        if rel == "hub" and not hub:
+            hub = href
+        elif rel == "self" and not topic:
+            topic = href
+    for href, rels in LINK_HEADER_RE.findall(link_header or ""):
+        rels = rels.lower().split()
+        if "hub" in rels and not hub:
+            hub = href
+        if "self" in rels and not topic:
+            topic = href
+    return hub, topic
+
+def note_feed(url: str, feed, link_header: str | None, cat_hint: str | None) -> bool:
+    """Record the feed's hub for subscription; True if it advertises one."""
+    hub, topic = discover(feed, link_header)
+    if not hub:
+        return False
+    topic = topic or url
+    cid = callback_id(topic)
+    with _state() as subs:
+        sub = subs.get(cid)
+        if not sub or sub["hub"] != hub:
+            subs[cid] = {"topic": topic, "hub": hub, "feed_url": url, "cat_hint": cat_hint,
+                         "secret": secrets.token_hex(20), "state": "new", "lease_until": 0, "next_try": 0}
+    return True
+
+# ---------- subscription management ----------
+def _hub_request(sub: dict, cid: str, mode: str) -> bool:
+    data = {
+        "hub.mode": mode,
+        "hub.topic": sub["topic"],
+        "hub.callback": f"{CALLBACK_BASE.rstrip('/')}/websub/{cid}",
+        "hub.lease_seconds": str(LEASE_SECONDS),
+        "hub.secret": sub["secret"],
+    }
+    try:
+        r = requests.post(sub["hub"], data=data, timeout=HUB_TIMEOUT)
+    except Exception as e:
+        print(f"websub: {mode} {sub['topic']} -> {e!r}")
+        return False
+    # 202: verification follows asynchronously; some hubs verify inline and answer 204
+    ok = r.status_code in (202, 204)
+    if not ok:
+        print(f"websub: {mode} {sub['topic']} -> {r.status_code} {r.text[:200]}")
+    return ok
+
+def renew_due(now: float | None = None) -> int:
+    """(Re)subscribe everything new, expiring or retryable. Returns requests sent."""
+    now = now or time.time()
+    due = []
+    with _state() as subs:
+        for cid, s in subs.items():
+            # active subscriptions carry their renewal time in next_try (see do_GET)
+            if s["state"] in ("new", "failed", "pending", "active") and s["next_try"] <= now:
+                # marked before asking: hubs may verify before answering the request;
+                # until the hub confirms, don't ask again every tick
+                if s["state"] != "active":
+                    s["state"] = "pending"
+                s["next_try"] = now + min(RETRY_SECONDS, RENEW_BEFORE // 2)
+                due.append((cid, dict(s)))
+    for cid, sub in due:
+        if not _hub_request(sub, cid, "subscribe"):
+            with _state() as subs:
+                s = subs.get(cid)
+                if s and s["state"] == "pending":
+                    s["state"] = "failed"
+                    s["next_try"] = now + RETRY_SECONDS
+    return len(due)
+
+def unsubscribe(topic: str) -> bool:
+    cid = callback_id(topic)
+    with _state() as subs:
+        sub = dict(subs.get(cid) or {})
+        if sub:
+            subs[cid]["state"] = "unsubscribing"
+    if not sub:
+        return False
+    return _hub_request(sub, cid, "unsubscribe")
+
+# ---------- receiver ----------
+def verify_signature(secret: str, body: bytes, header: str | None) -> bool:
+    if not header or "=" not in header:
+        return False
+    algo, _, sig = header.partition("=")
+    fn = SIG_ALGOS.get(algo.strip().lower())
+    if not fn:
+        return False
+    want = hmac.new(secret.encode("utf-8"), body, fn).hexdigest()
+    return hmac.compare_digest(want, sig.strip().lower())
+
+class PushSink:
+    """Background worker: pushed feed bodies -> clean_one -> batched post_batch."""
+
+    def __init__(self):
+        self.q: queue.Queue = queue.Queue()
+        self.stats = {"pushes": 0, "entries": 0, "posted": 0, "rejected": 0, "failed": 0}
+        self.retry_at = 0.0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def push(self, cid: str, body: bytes) -> None:
+        self.q.put((cid, body))
+
+    def _run(self) -> None:
+        import feedparser
+        import ingest_feeds_enhanced as ing
+        from datetime import datetime, timedelta, timezone
+        batch = []
+        while True:
+            try:
+                cid, body = self.q.get(timeout=FLUSH_SECONDS)
+            except queue.Empty:
+                if batch and self._post(ing, batch):
+                    batch = []
+                if not batch:
+                    self._seal(ing)
+                continue
+            self.stats["pushes"] += 1
+            cutoff = datetime.now(timezone.utc) - timedelta(days=ing.CUTOFF_DAYS)
+            try:
+                feed = feedparser.parse(body)
+                for e in feed.entries:
+                    doc = ing.clean_one(feed, e)
+                    if doc and ing.within_cutoff(doc, cutoff):
+                        batch.append(doc)
+                        self.stats["entries"] += 1
+                    if len(batch) >= ing.BATCH_SIZE and self._post(ing, batch):
+                        batch = []
+            except Exception as e:
+                print(f"websub: push for {cid} failed: {e!r}")
+
+    def _post(self, ing, batch) -> bool:
+        """
+        post_batch + state saves; never raises, since this thread is the only
+        consumer. False (batch kept for a retry after FLUSH_SECONDS) if posting failed.
+        """
+        if time.monotonic() < self.retry_at:
+            return False
+        try:
+            ing.post_batch(batch)
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.retry_at = time.monotonic() + FLUSH_SECONDS
+            print(f"websub: posting {len(batch)} entries failed, will retry: {e!r}")
+            return False
+        self.stats["posted"] += len(batch)
+        for mod in (ing.strategy_stats, ing.keyword_engine, ing.related_index):
+            try:
+                mod.save()
+            except Exception as e:
+                print(f"websub: saving {mod.__name__} failed: {e!r}")
+        return True
+
+    def _seal(self, ing) -> None:
+        """Pushes went quiet: seal the spool segment (SINK=spool) so it drains now."""
+        try:
+            ing.seal_sink()
+        except Exception as e:
+            print(f"websub: sealing the spool segment failed: {e!r}")
+
+class _Handler(BaseHTTPRequestHandler):
+    sink: PushSink
+
+    def log_message(self, *a):
+        pass
+
+    def _reply(self, status: int, body: bytes = b"") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cid(self) -> str | None:
+        parts = urlparse(self.path).path.strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "websub" else None
+
+    def do_GET(self):
+        # hub verification of (un)subscribe intent, or a denial notice
+        cid = self._cid()
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        mode, topic = q.get("hub.mode"), q.get("hub.topic")
+        status, body = 404, b""
+        with _state() as subs:
+            sub = subs.get(cid or "")
+            expected = {"subscribe": ("pending", "active"), "unsubscribe": ("unsubscribing",)}
+            known = bool(sub) and sub["topic"] == topic
+            if known and mode == "denied":
+                print(f"websub: hub denied {topic}: {q.get('hub.reason', '')}")
+                sub["state"] = "denied"
+                status = 200
+            elif known and sub["state"] in expected.get(mode, ()):
+                if mode == "subscribe":
+                    lease = int(q.get("hub.lease_seconds") or LEASE_SECONDS)
+                    now = time.time()
+                    # hubs may grant less than asked: renew RENEW_BEFORE ahead, but never in the first 80% of a lease
+                    sub.update(state="active", lease_until=now + lease, next_try=now + lease - min(RENEW_BEFORE, lease // 5))
+                else:
+                    sub["state"] = "unsubscribed"
+                status, body = 200, (q.get("hub.challenge") or "").encode("utf-8")
+        self._reply(status, body)
+
+    def do_POST(self):
+        cid = self._cid()
+        n = int(self.headers.get("Content-Length") or 0)
+        sub = _read().get(cid or "") or {}
+        if not sub or sub.get("state") != "active":
+            return self._reply(410 if sub.get("state") == "unsubscribed" else 404)
+        if n > MAX_PUSH_BYTES:
+            return self._reply(413)
+        body = self.rfile.read(n)
+        # spec: answer 2xx even for a bad signature, but ignore the content
+        if not verify_signature(sub["secret"], body, self.headers.get("X-Hub-Signature")):
+            self.sink.stats["rejected"] += 1
+            print(f"websub: bad signature for {sub['topic']}, ignored")
+            return self._reply(202)
+        self.sink.push(cid, body)
+        self._reply(202)
+
+def serve(port: int, host: str = "0.0.0.0", renew_every: float = 60.0) -> ThreadingHTTPServer:
+    """Start the receiver and the lease renewal loop in background threads."""
+    class Handler(_Handler):
+        pass
+    Handler.sink = PushSink()
+    srv = ThreadingHTTPServer((host, port), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    def renew_loop():
+        while True:
+            try:
+                renew_due()
+            except Exception as e:
+                print(f"websub: renewal failed: {e!r}")
+            time.sleep(renew_every)
+    threading.Thread(target=renew_loop, daemon=True).start()
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="WebSub push receiver for the ingest")
+    ap.add_argument("--port", type=int, default=int(os.getenv("WEBSUB_PORT", "8088")))
+    ap.add_argument("--list", action="store_true", help="print known subscriptions and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for cid, s in _read().items():
+            left = max(0, s["lease_until"] - time.time()) / 3600
+            print(f"{cid}  {s['state']:<12} {left:6.1f}h  {s['topic']}  via {s['hub']}")
+        return
+    srv = serve(args.port)
+    print(f"websub receiver on :{args.port}, callbacks at {CALLBACK_BASE}/websub/<id>, {len(_read())} topics")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()